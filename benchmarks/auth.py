@@ -0,0 +1,143 @@
+"""What authenticating a request costs.
+
+Measures decode_access_token with and without a cached principal, the
+revocation check with --revocations entries in the list, and then the whole
+request through an authenticated route. It counts the SQL statements the
+authenticated requests send; with claims carried in the token that should
+be none, and the run fails otherwise.
+
+    python -m benchmarks.auth --tokens 2000 --revocations 100000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import httpx
+
+from .run import REPO_ROOT, configure_environment, percentile
+from .seed import SeedCounts, seed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000, help="distinct tokens to decode")
+    parser.add_argument("--revocations", type=int, default=100_000, help="revoked tokens in the list while checking")
+    parser.add_argument("--requests", type=int, default=2000, help="authenticated requests sent end to end")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--rate-limits", action="store_true", help="keep rate limiting and load shedding on")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def per_call_us(func, arguments) -> dict:
+    timings = []
+    for argument in arguments:
+        start = time.perf_counter()
+        func(argument)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {"p50_us": percentile(timings, 0.50) * 1e6, "p99_us": percentile(timings, 0.99) * 1e6,
+            "mean_us": sum(timings) / len(timings) * 1e6}
+
+
+def mint(data, count: int) -> list:
+    from src.auth.tokens import create_access_token
+
+    tokens = []
+    for i in range(count):
+        customer_id, email = data.customer_ids[i % len(data.customer_ids)], data.customer_emails[i % len(data.customer_emails)]
+        claims = {"customer_id": customer_id, "first_name": "Bench", "last_name": "Customer", "email": email,
+                  "phone_number": "tel:+1-415-555-2671"}
+        tokens.append(create_access_token(email, "customer", claims, timedelta(minutes=30)))
+    return tokens
+
+
+def decode_costs(tokens: list) -> dict:
+    from src.auth.tokens import decode_access_token, principal_cache
+
+    principal_cache.clear()
+    cold = per_call_us(lambda token: decode_access_token(token, "customer"), tokens)
+    cached = per_call_us(lambda token: decode_access_token(token, "customer"), tokens)
+    return {"verify_signature": cold, "cached": cached}
+
+
+async def revocation_costs(tokens: list, revoked: int) -> dict:
+    from src.auth.revocations import revocations
+    from src.auth.tokens import decode_access_token
+
+    claims = [decode_access_token(token, "customer") for token in tokens]
+    expires_at = time.time() + 600
+    # Straight into the mirror: this measures the check, not the inserts
+    for i in range(revoked):
+        revocations._tokens[f"bench-{i}"] = expires_at
+    try:
+        return per_call_us(revocations.is_revoked, claims)
+    finally:
+        revocations.clear()
+        await revocations.sync()
+
+
+async def request_costs(client, tokens: list, requests: int) -> dict:
+    from src.metrics.instrumentation import RouteMetrics, registry
+
+    # The request metrics count only statements sent on a request's behalf, not the background pollers'
+    route = ("GET", "/customer/secure-route/")
+    before = registry.routes.get(route, RouteMetrics()).statements
+    latencies = []
+    for i in range(requests):
+        headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+        start = time.perf_counter()
+        (await client.get("/customer/secure-route/", headers=headers)).raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    statements = registry.routes[route].statements - before
+    latencies.sort()
+    return {"requests": requests, "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000, "statements_per_request": statements / requests}
+
+
+async def benchmark(args):
+    from src.app import app
+
+    counts = SeedCounts(customers=min(args.tokens, 1000), owners=1, gyms=1, slots=1, orders=0, update_slots=0)
+    async with app.router.lifespan_context(app):
+        data = await seed(counts, random.Random(args.seed))
+        tokens = mint(data, args.tokens)
+        results = {"decode": decode_costs(tokens), "revocation_check": await revocation_costs(tokens, args.revocations)}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            results["request"] = await request_costs(client, tokens, args.requests)
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, str(REPO_ROOT))
+    with tempfile.TemporaryDirectory(prefix="gyg-benchmark-") as workdir:
+        configure_environment(args, Path(workdir))
+        results = asyncio.run(benchmark(args))
+
+    decode, check, request = results["decode"], results["revocation_check"], results["request"]
+    print(f"decode, verifying signature  p50 {decode['verify_signature']['p50_us']:>8.1f}us  "
+          f"p99 {decode['verify_signature']['p99_us']:>8.1f}us")
+    print(f"decode, cached principal     p50 {decode['cached']['p50_us']:>8.1f}us  p99 {decode['cached']['p99_us']:>8.1f}us")
+    print(f"revocation check ({args.revocations} revoked)  p50 {check['p50_us']:>8.1f}us  p99 {check['p99_us']:>8.1f}us")
+    print(f"authenticated request        p50 {request['p50_ms']:>8.2f}ms  p99 {request['p99_ms']:>8.2f}ms  "
+          f"{request['statements_per_request']:.2f} SQL statements per request")
+    if args.output:
+        Path(args.output).write_text(json.dumps({"config": vars(args), **results}, indent=2) + "\n")
+
+    if request["statements_per_request"]:
+        print("FAIL authenticated requests queried the database", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Fire thousands of parallel bookings at one slot and check it is never oversold.
+
+Every booking is a distinct customer, all sent at once. The run reports
+throughput and latency, how many requests got a seat, found the slot full or
+were turned away as busy, and fails if the slot ended up with more orders
+than seats or if its remaining capacity disagrees with the orders booked.
+
+    python -m benchmarks.booking --bookings 5000 --capacity 500
+    python -m benchmarks.booking --mode uvicorn --workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+from .run import REPO_ROOT, configure_environment, free_port, percentile, wait_until_ready
+from .seed import SeedCounts, seed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--bookings", type=int, default=5000, help="parallel booking requests, one per customer")
+    parser.add_argument("--capacity", type=int, default=500, help="seats in the contested slot")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--rate-limits", action="store_true", help="keep rate limiting and load shedding on")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def customer_headers(data) -> list:
+    """Mint a token per seeded customer, so the run measures booking rather than logins."""
+    from src.auth.tokens import create_access_token
+
+    headers = []
+    for customer_id, email in zip(data.customer_ids, data.customer_emails):
+        claims = {"customer_id": customer_id, "first_name": "Bench", "last_name": "Customer", "email": email,
+                  "phone_number": "tel:+1-415-555-2671"}
+        token = create_access_token(email, "customer", claims, timedelta(hours=1))
+        headers.append({"Authorization": f"Bearer {token}"})
+    return headers
+
+
+async def fire(client, data, headers) -> dict:
+    order_time = (datetime.now() + timedelta(hours=1)).isoformat()
+    latencies = []
+    statuses = Counter()
+
+    async def book(customer_id, auth):
+        order = {"order_id": "new", "customer_id": customer_id, "gym_id": data.hot_gym_id,
+                 "slot_id": data.hot_slot_id, "order_time": order_time, "status": "Created"}
+        start = time.perf_counter()
+        try:
+            status = (await client.post("/order/create_order/", json=order, headers=auth)).status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        latencies.append(time.perf_counter() - start)
+        statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(book(customer_id, auth) for customer_id, auth in zip(data.customer_ids, headers)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "statuses": {str(status): count for status, count in statuses.items()},
+    }
+
+
+async def check(data, seated: int) -> dict:
+    from sqlalchemy import func, select
+    from src.models import Order, Slot
+    from src.models.base import SessionLocal
+
+    async with SessionLocal() as db:
+        booked = await db.scalar(select(func.count()).select_from(Order).where(Order.slot_id == data.hot_slot_id))
+        remaining = await db.scalar(select(Slot.available_capacity).where(Slot.slot_id == data.hot_slot_id))
+    return {
+        "booked": booked,
+        "remaining": remaining,
+        "oversold": max(0, booked - data.hot_slot_capacity) + max(0, -remaining),
+        # Seats taken off the slot that no order holds, or orders no seat was taken for
+        "lost_seats": abs(data.hot_slot_capacity - remaining - booked),
+        # A 200 the client saw for an order that was not stored, or the reverse
+        "unacknowledged": abs(booked - seated),
+    }
+
+
+async def benchmark(args, env):
+    counts = SeedCounts(customers=args.bookings, owners=1, gyms=1, slots=1, orders=0, update_slots=0,
+                        hot_slot_capacity=args.capacity)
+    limits = httpx.Limits(max_connections=args.bookings, max_keepalive_connections=args.bookings)
+
+    if args.mode == "inprocess":
+        from src.app import app
+
+        async with app.router.lifespan_context(app):
+            data = await seed(counts, random.Random(args.seed))
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", limits=limits,
+                                         timeout=120) as client:
+                result = await fire(client, data, customer_headers(data))
+        return result, await check(data, result["statuses"].get("200", 0))
+
+    data = await seed(counts, random.Random(args.seed))
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=REPO_ROOT, env={**os.environ, **env},
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        await wait_until_ready(base_url, server)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+            result = await fire(client, data, customer_headers(data))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return result, await check(data, result["statuses"].get("200", 0))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, str(REPO_ROOT))
+    with tempfile.TemporaryDirectory(prefix="gyg-benchmark-") as workdir:
+        env = configure_environment(args, Path(workdir))
+        result, invariants = asyncio.run(benchmark(args, env))
+
+    print(
+        f"{result['requests']} bookings in {result['seconds']:.2f}s  {result['rps']:.1f} req/s  "
+        f"p50 {result['p50_ms']:.2f}ms  p99 {result['p99_ms']:.2f}ms  statuses {result['statuses']}"
+    )
+    print(json.dumps(invariants))
+    if args.output:
+        Path(args.output).write_text(json.dumps({"config": vars(args), "result": result, "invariants": invariants},
+                                                indent=2) + "\n")
+
+    failures = []
+    if invariants["oversold"]:
+        failures.append(f"slot oversold by {invariants['oversold']}")
+    if invariants["lost_seats"]:
+        failures.append(f"capacity and orders disagree by {invariants['lost_seats']}")
+    if invariants["unacknowledged"]:
+        failures.append(f"{invariants['unacknowledged']} bookings differ between responses and the database")
+    unexpected = {status: count for status, count in result["statuses"].items() if status not in ("200", "400", "503")}
+    if unexpected:
+        failures.append(f"unexpected responses {unexpected}")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Insert throughput and index size for each primary key scheme.
+
+Inserts --rows rows shaped like an order (key, customer, timestamp, with the
+same (customer_id, order_time) index) into a fresh SQLite database per scheme,
+in transactions of --batch rows, through the same column types the models use.
+Random keys slow down as the key index outgrows the page cache, so compare the
+last tenth's rate with the first's as well as the totals:
+
+    python -m benchmarks.ids --rows 10000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .run import REPO_ROOT
+
+# (name, ID_GENERATOR, ID_STORAGE)
+SCHEMES = [
+    ("uuid4-string", "uuid4", "string"),
+    ("uuid7-string", "uuid7", "string"),
+    ("snowflake-string", "snowflake", "string"),
+    ("uuid4-binary", "uuid4", "binary"),
+    ("uuid7-binary", "uuid7", "binary"),
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=10_000, help="rows per transaction")
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--cache-mb", type=int, default=64, help="SQLite page cache per connection")
+    parser.add_argument("--only", help="comma separated scheme names to run")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def build_table(storage: str):
+    from sqlalchemy import Column, DateTime, Index, MetaData, String, Table
+    from src.models.types import BinaryId
+
+    key_type = BinaryId if storage == "binary" else lambda: String(50)
+    metadata = MetaData()
+    table = Table(
+        "bench_order", metadata,
+        Column("order_id", key_type(), primary_key=True),
+        Column("customer_id", key_type()),
+        Column("order_time", DateTime),
+        Index("ix_bench_order_customer_id_order_time", "customer_id", "order_time"),
+    )
+    return metadata, table
+
+
+def sizes(connection) -> dict:
+    """Bytes used by the table and by each index, from SQLite's dbstat table."""
+    from sqlalchemy import text
+
+    rows = connection.execute(text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")).all()
+    by_name = {name: size for name, size in rows}
+    return {
+        "table_mb": by_name.get("bench_order", 0) / 2**20,
+        # A text or blob primary key gets its own index beside the rowid table
+        "key_index_mb": sum(size for name, size in by_name.items() if name.startswith("sqlite_autoindex_bench_order")) / 2**20,
+        "customer_index_mb": by_name.get("ix_bench_order_customer_id_order_time", 0) / 2**20,
+    }
+
+
+def run_scheme(args, workdir: Path, name: str, generator_name: str, storage: str) -> dict:
+    from datetime import datetime, timedelta
+    from sqlalchemy import create_engine, event
+    from src.utils import ids
+
+    generator = ids.SnowflakeGenerator(1) if generator_name == "snowflake" else ids.generator_from_env(generator_name)
+    # Customer keys come from the same scheme, as they would in the application
+    rng = random.Random(args.seed)
+    customers = [generator() for _ in range(args.customers)]
+
+    path = workdir / f"{name}.db"
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def configure(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+        dbapi_connection.execute("PRAGMA synchronous=NORMAL")
+        dbapi_connection.execute(f"PRAGMA cache_size=-{args.cache_mb * 1024}")
+
+    metadata, table = build_table(storage)
+    metadata.create_all(engine)
+    started_at = datetime.now()
+    rates = []
+    total = 0.0
+    with engine.connect() as connection:
+        for offset in range(0, args.rows, args.batch):
+            count = min(args.batch, args.rows - offset)
+            rows = [
+                {"order_id": generator(), "customer_id": rng.choice(customers),
+                 "order_time": started_at + timedelta(milliseconds=offset + i)}
+                for i in range(count)
+            ]
+            start = time.perf_counter()
+            connection.execute(table.insert(), rows)
+            connection.commit()
+            elapsed = time.perf_counter() - start
+            total += elapsed
+            rates.append(count / elapsed)
+        result = {"rows_per_second": args.rows / total, **sizes(connection)}
+    engine.dispose()
+
+    tenth = max(1, len(rates) // 10)
+    result["first_tenth_rows_per_second"] = sum(rates[:tenth]) / tenth
+    result["last_tenth_rows_per_second"] = sum(rates[-tenth:]) / tenth
+    result["file_mb"] = sum(p.stat().st_size for p in workdir.glob(f"{name}.db*")) / 2**20
+    for p in workdir.glob(f"{name}.db*"):
+        os.remove(p)
+    return result
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, str(REPO_ROOT))
+    selected = set(args.only.split(",")) if args.only else None
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="gyg-benchmark-") as workdir:
+        for name, generator_name, storage in SCHEMES:
+            if selected and name not in selected:
+                continue
+            results[name] = result = run_scheme(args, Path(workdir), name, generator_name, storage)
+            print(
+                f"{name:<18} {result['rows_per_second']:>10.0f} rows/s  "
+                f"(first tenth {result['first_tenth_rows_per_second']:>8.0f}, "
+                f"last tenth {result['last_tenth_rows_per_second']:>8.0f})  "
+                f"key index {result['key_index_mb']:>8.1f}MB  customer index {result['customer_index_mb']:>8.1f}MB  "
+                f"table {result['table_mb']:>8.1f}MB",
+                flush=True,
+            )
+    if args.output:
+        Path(args.output).write_text(json.dumps({"config": vars(args), "schemes": results}, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
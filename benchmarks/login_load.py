@@ -0,0 +1,121 @@
+"""How other requests' latency responds to a growing number of concurrent logins.
+
+For each concurrency level, that many clients log in back to back for
+--seconds while a probe client keeps calling an authenticated route. If
+logins blocked the event loop, the probe's p99 would grow in step with the
+number of logins in flight; with hashing off the loop it should stay flat.
+
+    python -m benchmarks.login_load --levels 1,8,32,128
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from .run import REPO_ROOT, configure_environment, percentile
+from .scenarios import PASSWORD, Context, login_principals
+from .seed import SeedCounts, seed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", default="1,8,32,128", help="comma separated numbers of concurrent logins")
+    parser.add_argument("--seconds", type=float, default=5.0, help="measuring time per level")
+    # Close to production cost, since the point is what a real hash does to everything else
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--rate-limits", action="store_true", help="keep rate limiting and load shedding on")
+    parser.add_argument("--max-growth", type=float,
+                        help="fail if the probe p99 at the highest level exceeds this multiple of the lowest")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+async def run_level(client, ctx: Context, logins: int, seconds: float) -> dict:
+    deadline = time.perf_counter() + seconds
+    login_latencies, probe_latencies = [], []
+    statuses = {}
+
+    async def login_loop(i):
+        email = ctx.data.customer_emails[i % len(ctx.data.customer_emails)]
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.post("/customer/login", data={"username": email, "password": PASSWORD})
+            login_latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 429:
+                # Back off as a well behaved client would, instead of spinning on the rejection
+                await asyncio.sleep(float(response.headers.get("Retry-After", 1)) * (0.5 + ctx.rng.random()))
+
+    async def probe():
+        _, headers = ctx.customer(0)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            (await client.get("/customer/secure-route/", headers=headers)).raise_for_status()
+            probe_latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(probe(), *(login_loop(i) for i in range(logins)))
+    login_latencies.sort()
+    probe_latencies.sort()
+    return {
+        "login_requests": len(login_latencies),
+        "logins_per_second": statuses.get(200, 0) / seconds,
+        "login_p50_ms": percentile(login_latencies, 0.50) * 1000,
+        "login_p99_ms": percentile(login_latencies, 0.99) * 1000,
+        "login_statuses": {str(status): count for status, count in statuses.items()},
+        "probe_requests": len(probe_latencies),
+        "probe_p50_ms": percentile(probe_latencies, 0.50) * 1000,
+        "probe_p99_ms": percentile(probe_latencies, 0.99) * 1000,
+    }
+
+
+async def benchmark(args):
+    from src.app import app
+
+    levels = [int(level) for level in args.levels.split(",")]
+    counts = SeedCounts(customers=max(levels), owners=1, gyms=1, slots=1, orders=0, update_slots=0)
+    async with app.router.lifespan_context(app):
+        data = await seed(counts, random.Random(args.seed))
+        ctx = Context(data=data, run_id=str(int(time.time())), rng=random.Random(args.seed))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+            await login_principals(client, ctx, 1)
+            results = {}
+            for level in levels:
+                results[level] = result = await run_level(client, ctx, level, args.seconds)
+                print(
+                    f"{level:>5} logins  {result['logins_per_second']:>8.1f} logins/s  "
+                    f"login p99 {result['login_p99_ms']:>9.2f}ms  "
+                    f"probe p50 {result['probe_p50_ms']:>8.2f}ms  p99 {result['probe_p99_ms']:>8.2f}ms  "
+                    f"statuses {result['login_statuses']}",
+                    flush=True,
+                )
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, str(REPO_ROOT))
+    with tempfile.TemporaryDirectory(prefix="gyg-benchmark-") as workdir:
+        configure_environment(args, Path(workdir))
+        results = asyncio.run(benchmark(args))
+    if args.output:
+        Path(args.output).write_text(json.dumps({"config": vars(args), "levels": results}, indent=2) + "\n")
+
+    lowest, highest = results[min(results)], results[max(results)]
+    growth = highest["probe_p99_ms"] / lowest["probe_p99_ms"] if lowest["probe_p99_ms"] else 0.0
+    print(f"probe p99 grew {growth:.1f}x from {min(results)} to {max(results)} concurrent logins")
+    if args.max_growth is not None and growth > args.max_growth:
+        print(f"FAIL probe p99 grew more than {args.max_growth}x", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""A burst of logins far beyond the password hashing pool, after a work factor change.
+
+Every seeded account starts with a hash at --old-rounds while the app runs at
+--bcrypt-rounds, as after raising BCRYPT_ROUNDS. --logins clients then log in
+at once. The pool takes what it can and answers the rest 429; those clients
+retry after Retry-After until --deadline. A ticker measures how late the
+event loop wakes it meanwhile. The run fails on any 5xx, on event loop lag
+past --max-lag-ms, or if an account that logged in still has its old hash.
+
+    python -m benchmarks.login_storm --logins 500 --old-rounds 4 --bcrypt-rounds 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+from .run import REPO_ROOT, configure_environment, percentile
+from .seed import PASSWORD, SeedCounts, seed
+
+TICK = 0.01
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=500, help="clients logging in at once, one account each")
+    parser.add_argument("--old-rounds", type=int, default=4, help="work factor the seeded hashes use")
+    parser.add_argument("--bcrypt-rounds", type=int, default=10, help="work factor the app is configured with")
+    parser.add_argument("--deadline", type=float, default=120.0, help="seconds clients keep retrying")
+    parser.add_argument("--max-lag-ms", type=float, default=100.0, help="fail if the event loop p99 lag exceeds this")
+    parser.add_argument("--rate-limits", action="store_true", help="keep rate limiting and load shedding on")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+async def downgrade_hashes(rounds: int):
+    """Store every customer's password at the old work factor."""
+    from passlib.context import CryptContext
+    from sqlalchemy import update
+    from src.models.base import SessionLocal
+    from src.models.customer import LoginCredential
+
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds).hash(PASSWORD)
+    async with SessionLocal() as db:
+        await db.execute(update(LoginCredential).values(password=old_hash))
+        await db.commit()
+
+
+async def hash_rounds() -> Counter:
+    from sqlalchemy import select
+    from src.models.base import SessionLocal
+    from src.models.customer import LoginCredential
+
+    async with SessionLocal() as db:
+        hashes = (await db.scalars(select(LoginCredential.password))).all()
+    # $2b$<rounds>$...
+    return Counter(int(stored.split("$")[2]) for stored in hashes)
+
+
+async def storm(client, emails: list, deadline: float, rng: random.Random) -> dict:
+    statuses = Counter()
+    first_attempt = Counter()
+    latencies, lags, finished = [], [], []
+    started = time.perf_counter()
+    stop_at = started + deadline
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + TICK
+            await asyncio.sleep(TICK)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    async def login(email):
+        attempt = 0
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            response = await client.post("/customer/login", data={"username": email, "password": PASSWORD})
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+            if not attempt:
+                first_attempt[response.status_code] += 1
+            attempt += 1
+            if response.status_code != 429:
+                finished.append(time.perf_counter() - started)
+                return
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)) * (0.5 + rng.random()))
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.gather(*(login(email) for email in emails))
+    done.set()
+    await tick
+
+    latencies.sort()
+    lags.sort()
+    return {
+        "clients": len(emails),
+        "seconds_until_all_answered": max(finished, default=0.0),
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "first_attempt_statuses": {str(status): count for status, count in first_attempt.items()},
+        "login_p50_ms": percentile(latencies, 0.50) * 1000,
+        "login_p99_ms": percentile(latencies, 0.99) * 1000,
+        "loop_lag_p50_ms": percentile(lags, 0.50) * 1000,
+        "loop_lag_p99_ms": percentile(lags, 0.99) * 1000,
+        "loop_lag_max_ms": (lags[-1] if lags else 0.0) * 1000,
+    }
+
+
+async def benchmark(args):
+    from src.app import app
+
+    counts = SeedCounts(customers=args.logins, owners=1, gyms=1, slots=1, orders=0, update_slots=0)
+    rng = random.Random(args.seed)
+    async with app.router.lifespan_context(app):
+        data = await seed(counts, random.Random(args.seed))
+        await downgrade_hashes(args.old_rounds)
+        limits = httpx.Limits(max_connections=args.logins, max_keepalive_connections=args.logins)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark",
+                                     limits=limits, timeout=120) as client:
+            first = await storm(client, data.customer_emails, args.deadline, rng)
+            first["hash_rounds_after"] = {str(rounds): n for rounds, n in (await hash_rounds()).items()}
+            # Now every hash is current, so nothing is rehashed and each login costs one verify
+            second = await storm(client, data.customer_emails, args.deadline, rng)
+            second["hash_rounds_after"] = {str(rounds): n for rounds, n in (await hash_rounds()).items()}
+    return {"storm_after_cost_change": first, "storm_at_current_cost": second}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, str(REPO_ROOT))
+    with tempfile.TemporaryDirectory(prefix="gyg-benchmark-") as workdir:
+        configure_environment(args, Path(workdir))
+        results = asyncio.run(benchmark(args))
+
+    failures = []
+    for name, result in results.items():
+        print(
+            f"{name:<24} {result['clients']} clients answered in {result['seconds_until_all_answered']:.2f}s  "
+            f"first attempt {result['first_attempt_statuses']}  all {result['statuses']}  "
+            f"login p99 {result['login_p99_ms']:.1f}ms  loop lag p99 {result['loop_lag_p99_ms']:.1f}ms "
+            f"max {result['loop_lag_max_ms']:.1f}ms  hash rounds {result['hash_rounds_after']}"
+        )
+        errors = {status: n for status, n in result["statuses"].items() if status not in ("200", "429")}
+        if errors:
+            failures.append(f"{name}: unexpected responses {errors}")
+        if result["statuses"].get("200", 0) < result["clients"]:
+            failures.append(f"{name}: only {result['statuses'].get('200', 0)} of {result['clients']} logged in "
+                            f"within {args.deadline}s")
+        if result["loop_lag_p99_ms"] > args.max_lag_ms:
+            failures.append(f"{name}: event loop p99 lag {result['loop_lag_p99_ms']:.1f}ms over {args.max_lag_ms}ms")
+    stale = results["storm_after_cost_change"]["hash_rounds_after"].get(str(args.old_rounds), 0)
+    if args.old_rounds != args.bcrypt_rounds and stale:
+        failures.append(f"{stale} accounts kept their {args.old_rounds} round hash after logging in")
+    if args.output:
+        Path(args.output).write_text(json.dumps({"config": vars(args), **results}, indent=2) + "\n")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""End to end load benchmark for every router.
+
+Seeds a synthetic data set into a throwaway SQLite database, then drives the
+app with concurrent clients either in-process (ASGI transport) or through a
+local uvicorn server, and reports req/s and p50/p95/p99 per endpoint.
+
+    python -m benchmarks.run --mode inprocess --output results.json
+    python -m benchmarks.run --mode uvicorn --workers 2 --baseline benchmarks/baseline.json
+
+With --baseline the run fails (exit code 1) when any endpoint's throughput
+drops, or its p99 grows, by more than --threshold relative to the baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+from .scenarios import SCENARIOS, Context, login_principals
+from .seed import SeedCounts, seed
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SHED_STATUSES = (429, 503)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--only", help="comma separated scenario names to run")
+    parser.add_argument("--customers", type=int, default=SeedCounts.customers)
+    parser.add_argument("--owners", type=int, default=SeedCounts.owners)
+    parser.add_argument("--gyms", type=int, default=SeedCounts.gyms)
+    parser.add_argument("--slots", type=int, default=SeedCounts.slots)
+    parser.add_argument("--orders", type=int, default=SeedCounts.orders)
+    parser.add_argument("--hot-slot-capacity", type=int, default=SeedCounts.hot_slot_capacity)
+    parser.add_argument("--logged-in-customers", type=int, default=100)
+    # Production cost would make login scenarios measure little besides bcrypt
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    # All load comes from one address, which the per-IP budgets would throttle
+    parser.add_argument("--rate-limits", action="store_true", help="keep rate limiting and load shedding on")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against a JSON baseline from an earlier run")
+    parser.add_argument("--save-baseline", help="write results as the new baseline to this path")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression, 0.2 is 20%%")
+    return parser.parse_args(argv)
+
+
+def generate_keys():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem.decode(), public_pem.decode()
+
+
+def configure_environment(args, workdir: Path) -> dict:
+    """Point the app at a fresh database; must run before anything under src is imported."""
+    env = {
+        "DATABASE_URL": f"sqlite+aiosqlite:///{workdir / 'benchmark.db'}",
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "RATE_LIMIT_ENABLED": "1" if args.rate_limits else "0",
+    }
+    if not os.environ.get("JWT_PRIVATE_KEY") or not os.environ.get("JWT_PUBLIC_KEY"):
+        env["JWT_PRIVATE_KEY"], env["JWT_PUBLIC_KEY"] = generate_keys()
+    os.environ.update(env)
+    return env
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def drive(client, ctx, scenario, requests, concurrency):
+    latencies = []
+    statuses = Counter()
+    indexes = iter(range(requests))
+
+    async def worker():
+        # Workers share one iterator, so each request index is sent exactly once
+        for i in indexes:
+            start = time.perf_counter()
+            try:
+                response = await scenario.call(client, ctx, i)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    # Load shedding is the server protecting itself, not a failure of the endpoint
+    shed = sum(count for status, count in statuses.items() if status in SHED_STATUSES)
+    errors = sum(
+        count for status, count in statuses.items() if status not in scenario.ok_statuses + SHED_STATUSES
+    )
+    return {
+        "requests": requests,
+        "errors": errors,
+        "shed": shed,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "seconds": elapsed,
+        "rps": requests / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def check_invariants(data) -> dict:
+    from sqlalchemy import func, select
+    from src.models import IdempotencyRecord, Order, Slot
+    from src.models.base import SessionLocal
+    from src.orders import occupancy
+
+    async with SessionLocal() as db:
+        booked = await db.scalar(select(func.count()).select_from(Order).where(Order.slot_id == data.hot_slot_id))
+        remaining = await db.scalar(select(Slot.available_capacity).where(Slot.slot_id == data.hot_slot_id))
+        retry_booked = await db.scalar(
+            select(func.count()).select_from(Order).where(Order.slot_id == data.retry_slot_id)
+        )
+        retry_keys = await db.scalar(
+            select(func.count()).select_from(IdempotencyRecord).where(IdempotencyRecord.key.like("%-storm-%"))
+        )
+        mismatches = await occupancy.check(db)
+    return {
+        "hot_slot_booked": booked,
+        "hot_slot_remaining": remaining,
+        "hot_slot_oversold": max(0, booked - data.hot_slot_capacity) + max(0, -remaining),
+        "occupancy_mismatches": len(mismatches),
+        # Bookings beyond one per idempotency key
+        "retry_storm_duplicates": retry_booked - retry_keys,
+    }
+
+
+async def run_scenarios(client, args, data):
+    ctx = Context(data=data, run_id=str(int(time.time())), rng=random.Random(args.seed))
+    await login_principals(client, ctx, args.logged_in_customers)
+
+    selected = set(args.only.split(",")) if args.only else None
+    endpoints = {}
+    for scenario in SCENARIOS:
+        if selected and scenario.name not in selected:
+            continue
+        result = await drive(client, ctx, scenario, args.requests, args.concurrency)
+        endpoints[scenario.name] = result
+        print(
+            f"{scenario.name:<22} {result['rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f}ms  "
+            f"p95 {result['p95_ms']:>8.2f}ms  p99 {result['p99_ms']:>8.2f}ms  shed {result['shed']}  errors {result['errors']}",
+            flush=True,
+        )
+    return endpoints
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(base_url, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited before becoming ready")
+            try:
+                if (await client.get("/metrics")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not become ready in time")
+
+
+async def benchmark(args, env):
+    counts = SeedCounts(
+        customers=args.customers, owners=args.owners, gyms=args.gyms, slots=args.slots, orders=args.orders,
+        update_slots=args.requests, hot_slot_capacity=args.hot_slot_capacity,
+    )
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    if args.mode == "inprocess":
+        from src.app import app
+
+        async with app.router.lifespan_context(app):
+            data = await seed(counts, random.Random(args.seed))
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", limits=limits) as client:
+                endpoints = await run_scenarios(client, args, data)
+        # Checked once shutdown has stopped the order event consumer, so nothing writes meanwhile
+        return endpoints, await check_invariants(data)
+
+    data = await seed(counts, random.Random(args.seed))
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=REPO_ROOT, env={**os.environ, **env},
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        await wait_until_ready(base_url, server)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            endpoints = await run_scenarios(client, args, data)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return endpoints, await check_invariants(data)
+
+
+def compare(results, baseline, threshold):
+    """Return a description of every endpoint that regressed beyond threshold."""
+    regressions = []
+    for name, before in baseline.get("endpoints", {}).items():
+        after = results["endpoints"].get(name)
+        if after is None:
+            continue
+        if after["rps"] < before["rps"] * (1 - threshold):
+            regressions.append(f"{name}: {after['rps']:.1f} req/s vs baseline {before['rps']:.1f}")
+        if after["p99_ms"] > before["p99_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p99 {after['p99_ms']:.2f}ms vs baseline {before['p99_ms']:.2f}ms")
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, str(REPO_ROOT))
+
+    with tempfile.TemporaryDirectory(prefix="gyg-benchmark-") as workdir:
+        env = configure_environment(args, Path(workdir))
+        endpoints, invariants = asyncio.run(benchmark(args, env))
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "save_baseline")}
+    results = {"config": config, "endpoints": endpoints, "invariants": invariants}
+    print(json.dumps(invariants))
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            Path(path).write_text(json.dumps(results, indent=2) + "\n")
+
+    failures = []
+    if invariants["hot_slot_oversold"]:
+        failures.append(f"hot slot oversold by {invariants['hot_slot_oversold']}")
+    if invariants["occupancy_mismatches"]:
+        failures.append(f"{invariants['occupancy_mismatches']} occupancy counters disagree with a full recompute")
+    if invariants["retry_storm_duplicates"]:
+        failures.append(f"retried requests booked {invariants['retry_storm_duplicates']} extra seats")
+    failures += [f"{name}: {result['errors']} errors" for name, result in endpoints.items() if result["errors"]]
+    if args.baseline:
+        failures += compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import asyncio
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+from .seed import PASSWORD, SeedData
+
+
+@dataclass
+class Context:
+    data: SeedData
+    run_id: str
+    rng: random.Random
+    customer_headers: List[dict] = field(default_factory=list)
+    owner_headers: Dict[str, dict] = field(default_factory=dict)
+    # Fixed for the run, so retries of one request send identical bodies
+    order_time: datetime = field(default_factory=lambda: datetime.now() + timedelta(hours=1))
+
+    def customer(self, i: int):
+        index = i % len(self.customer_headers)
+        return self.data.customer_ids[index], self.customer_headers[index]
+
+    def owner_of(self, gym_id: str) -> dict:
+        return self.owner_headers[self.data.gym_owner[gym_id]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    call: Callable[..., Awaitable]
+    # Expected status codes; anything else counts as an error
+    ok_statuses: tuple = (200,)
+
+
+def bearer(response) -> dict:
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _login(client, path: str, username: str):
+    while True:
+        response = await client.post(path, data={"username": username, "password": PASSWORD})
+        # With rate limits on, the whole pool logs in from one address and has to wait its turn
+        if response.status_code != 429:
+            response.raise_for_status()
+            return bearer(response)
+        await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+
+async def login_principals(client, ctx: Context, customers: int):
+    """Log in a pool of seeded customers and every seeded owner before measuring."""
+    for email in ctx.data.customer_emails[:customers]:
+        ctx.customer_headers.append(await _login(client, "/customer/login", email))
+    for owner_id, username in zip(ctx.data.owner_ids, ctx.data.owner_usernames):
+        ctx.owner_headers[owner_id] = await _login(client, "/vendor/login", username)
+
+
+async def customer_signup(client, ctx: Context, i: int):
+    customer = {
+        "first_name": "Load", "last_name": f"Test {i}",
+        "email": f"load-{ctx.run_id}-{i}@example.com", "phone_number": "+14155552671",
+    }
+    return await client.post("/customer/signup/", params={"password": PASSWORD}, json=customer)
+
+
+async def customer_login(client, ctx: Context, i: int):
+    email = ctx.data.customer_emails[i % len(ctx.data.customer_emails)]
+    return await client.post("/customer/login", data={"username": email, "password": PASSWORD})
+
+
+async def vendor_signup(client, ctx: Context, i: int):
+    return await client.post("/vendor/signup", params={"username": f"load-{ctx.run_id}-{i}", "password": PASSWORD})
+
+
+async def vendor_login(client, ctx: Context, i: int):
+    username = ctx.data.owner_usernames[i % len(ctx.data.owner_usernames)]
+    return await client.post("/vendor/login", data={"username": username, "password": PASSWORD})
+
+
+async def slot_search(client, ctx: Context, i: int):
+    _, headers = ctx.customer(i)
+    start = datetime.now() + timedelta(days=1, hours=ctx.rng.randrange(24 * 30))
+    params = {"start_after": start.isoformat(), "end_before": (start + timedelta(days=7)).isoformat(), "limit": 50}
+    if i % 2:
+        params["gym_id"] = ctx.rng.choice(ctx.data.gym_ids)
+    return await client.get("/slots/search", params=params, headers=headers)
+
+
+async def order_history(client, ctx: Context, i: int):
+    _, headers = ctx.customer(i)
+    return await client.get("/customer/orders", params={"limit": 50}, headers=headers)
+
+
+def _order(ctx: Context, customer_id: str, slot_id: str) -> dict:
+    return {
+        "order_id": "new", "customer_id": customer_id, "gym_id": ctx.data.slot_gym[slot_id], "slot_id": slot_id,
+        "order_time": (datetime.now() + timedelta(hours=1)).isoformat(), "status": "Created",
+    }
+
+
+async def create_order(client, ctx: Context, i: int):
+    customer_id, headers = ctx.customer(i)
+    order = _order(ctx, customer_id, ctx.rng.choice(ctx.data.slot_ids))
+    return await client.post("/order/create_order/", json=order, headers=headers)
+
+
+async def hot_slot_booking(client, ctx: Context, i: int):
+    customer_id, headers = ctx.customer(i)
+    return await client.post("/order/create_order/", json=_order(ctx, customer_id, ctx.data.hot_slot_id), headers=headers)
+
+
+# Copies of each request sent at once, as a client retrying on timeouts would
+RETRY_STORM_COPIES = 8
+
+
+async def idempotent_retry_storm(client, ctx: Context, i: int):
+    request = i // RETRY_STORM_COPIES
+    customer_id, headers = ctx.customer(request)
+    order = {**_order(ctx, customer_id, ctx.data.retry_slot_id), "order_time": ctx.order_time.isoformat()}
+    headers = {**headers, "Idempotency-Key": f"{ctx.run_id}-storm-{request}"}
+    return await client.post("/order/create_order/", json=order, headers=headers)
+
+
+async def update_order_status(client, ctx: Context, i: int):
+    _, headers = ctx.customer(i)
+    order_id = ctx.data.order_ids[i % len(ctx.data.order_ids)]
+    return await client.put(f"/order/update_order_status/{order_id}", params={"new_status": "Confirmed"}, headers=headers)
+
+
+async def cancel_order(client, ctx: Context, i: int):
+    _, headers = ctx.customer(i)
+    # Walk the order list from the back so cancels and status updates rarely collide
+    order_id = ctx.data.order_ids[-1 - i % len(ctx.data.order_ids)]
+    return await client.put(f"/order/cancel_order/{order_id}", headers=headers)
+
+
+async def vendor_dashboard(client, ctx: Context, i: int):
+    owner_id = ctx.data.owner_ids[i % len(ctx.data.owner_ids)]
+    start = datetime.now().date() + timedelta(days=ctx.rng.randrange(30))
+    params = {"start": start.isoformat(), "end": (start + timedelta(days=30)).isoformat()}
+    return await client.get("/vendor/dashboard", params=params, headers=ctx.owner_headers[owner_id])
+
+
+async def gym_add(client, ctx: Context, i: int):
+    owner_id = ctx.data.owner_ids[i % len(ctx.data.owner_ids)]
+    gym = {"name": f"Load Gym {ctx.run_id}-{i}", "address": f"{i} Load Street", "capacity": 30}
+    return await client.post("/gym/add_gym/", json=gym, headers=ctx.owner_headers[owner_id])
+
+
+async def slot_update(client, ctx: Context, i: int):
+    # update_slot assigns a new slot id, so every request needs a slot of its own
+    slot_id = ctx.data.update_slot_ids[i % len(ctx.data.update_slot_ids)]
+    start = datetime.now() + timedelta(days=2, hours=i % 48)
+    params = {"new_start_time": start.isoformat(), "new_end_time": (start + timedelta(hours=1)).isoformat()}
+    return await client.put(f"/gym/slots/{slot_id}", params=params, headers=ctx.owner_of(ctx.data.slot_gym[slot_id]))
+
+
+async def gym_pause(client, ctx: Context, i: int):
+    gym_id = ctx.data.gym_ids[i % len(ctx.data.gym_ids)]
+    return await client.put(f"/gym/pause_gym/{gym_id}", headers=ctx.owner_of(gym_id))
+
+
+async def gym_remove(client, ctx: Context, i: int):
+    gym_id = ctx.data.gym_ids[i % len(ctx.data.gym_ids)]
+    return await client.put(f"/gym/remove_gym/{gym_id}", headers=ctx.owner_of(gym_id))
+
+
+# Ordered so that scenarios which change shared state (pausing gyms, moving slots) run last
+SCENARIOS = [
+    Scenario("customer_signup", customer_signup),
+    Scenario("customer_login", customer_login),
+    Scenario("vendor_signup", vendor_signup),
+    Scenario("vendor_login", vendor_login),
+    Scenario("slot_search", slot_search),
+    Scenario("order_history", order_history),
+    Scenario("create_order", create_order),
+    # A full slot answers 400, which is the expected outcome for most of this burst
+    Scenario("hot_slot_booking", hot_slot_booking, ok_statuses=(200, 400)),
+    Scenario("idempotent_retry_storm", idempotent_retry_storm),
+    Scenario("update_order_status", update_order_status, ok_statuses=(202,)),
+    Scenario("cancel_order", cancel_order, ok_statuses=(202,)),
+    Scenario("vendor_dashboard", vendor_dashboard),
+    Scenario("gym_add", gym_add),
+    Scenario("slot_update", slot_update),
+    Scenario("gym_pause", gym_pause),
+    Scenario("gym_remove", gym_remove),
+]
@@ -0,0 +1,148 @@
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List
+from sqlalchemy import insert
+
+CHUNK_SIZE = 1000
+PASSWORD = "benchmark-password"
+
+
+@dataclass
+class SeedCounts:
+    customers: int = 1000
+    owners: int = 20
+    gyms: int = 200
+    slots: int = 20000
+    orders: int = 20000
+    # Slots set aside for update_slot, which gives each slot a new id
+    update_slots: int = 500
+    hot_slot_capacity: int = 50
+
+
+@dataclass
+class SeedData:
+    customer_emails: List[str] = field(default_factory=list)
+    customer_ids: List[str] = field(default_factory=list)
+    owner_usernames: List[str] = field(default_factory=list)
+    owner_ids: List[str] = field(default_factory=list)
+    gym_ids: List[str] = field(default_factory=list)
+    gym_owner: dict = field(default_factory=dict)
+    slot_ids: List[str] = field(default_factory=list)
+    slot_gym: dict = field(default_factory=dict)
+    update_slot_ids: List[str] = field(default_factory=list)
+    order_ids: List[str] = field(default_factory=list)
+    hot_slot_id: str = ""
+    hot_gym_id: str = ""
+    hot_slot_capacity: int = 0
+    retry_slot_id: str = ""
+
+
+async def _insert_chunked(db, model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        await db.execute(insert(model), rows[start:start + CHUNK_SIZE])
+
+
+async def seed(counts: SeedCounts, rng: random.Random) -> SeedData:
+    """Populate an empty database with a synthetic data set and return the ids created."""
+    from src.auth.passwords import pwd_context
+    from src.models.base import SessionLocal, create_tables
+    from src.models import Customer, GymOwner, Gym, Slot, Order
+    from src.models.customer import LoginCredential
+    from src.orders.occupancy import rebuild
+
+    await create_tables()
+    data = SeedData(hot_slot_capacity=counts.hot_slot_capacity)
+    # One hash for every account; hashing thousands of passwords would dominate seeding
+    password_hash = pwd_context.hash(PASSWORD)
+    now = datetime.now()
+
+    customers, credentials = [], []
+    for i in range(counts.customers):
+        customer_id = f"bench-customer-{i}"
+        email = f"bench-customer-{i}@example.com"
+        customers.append({
+            "customer_id": customer_id, "first_name": "Bench", "last_name": f"Customer {i}",
+            "email": email, "phone_number": "tel:+1-415-555-2671",
+        })
+        credentials.append({
+            "credential_id": f"bench-credential-{i}", "customer_id": customer_id, "username": email,
+            "password": password_hash, "registration_date": now,
+        })
+        data.customer_ids.append(customer_id)
+        data.customer_emails.append(email)
+
+    owners = []
+    for i in range(counts.owners):
+        owner_id = f"bench-owner-{i}"
+        owners.append({"owner_id": owner_id, "username": f"bench-owner-{i}", "password": password_hash})
+        data.owner_ids.append(owner_id)
+        data.owner_usernames.append(f"bench-owner-{i}")
+
+    gyms = []
+    for i in range(counts.gyms):
+        gym_id = f"bench-gym-{i}"
+        owner_id = data.owner_ids[i % counts.owners]
+        gyms.append({
+            "gym_id": gym_id, "name": f"Bench Gym {i}", "address": f"{i} Bench Street, area{i % 10}",
+            "capacity": 50, "owner_id": owner_id, "status": "Added",
+        })
+        data.gym_owner[gym_id] = owner_id
+        data.gym_ids.append(gym_id)
+    # The hot slot gets a gym of its own, so pause/remove scenarios never touch it
+    data.hot_gym_id = "bench-hot-gym"
+    gyms.append({
+        "gym_id": data.hot_gym_id, "name": "Bench Hot Gym", "address": "0 Hot Street",
+        "capacity": counts.hot_slot_capacity, "owner_id": data.owner_ids[0], "status": "Added",
+    })
+
+    slots = []
+    for i in range(counts.slots + counts.update_slots):
+        slot_id = f"bench-slot-{i}"
+        gym_id = data.gym_ids[i % len(data.gym_ids)]
+        start_time = now + timedelta(days=1, hours=i % (24 * 60))
+        slots.append({
+            "slot_id": slot_id, "gym_id": gym_id, "start_time": start_time,
+            "end_time": start_time + timedelta(hours=1), "available_capacity": 1000,
+        })
+        data.slot_gym[slot_id] = gym_id
+        if i < counts.slots:
+            data.slot_ids.append(slot_id)
+        else:
+            data.update_slot_ids.append(slot_id)
+    data.hot_slot_id = "bench-hot-slot"
+    slots.append({
+        "slot_id": data.hot_slot_id, "gym_id": data.hot_gym_id, "start_time": now + timedelta(days=1),
+        "end_time": now + timedelta(days=1, hours=1), "available_capacity": counts.hot_slot_capacity,
+    })
+    data.slot_gym[data.hot_slot_id] = data.hot_gym_id
+    # Never fills up, so every distinct retried request books exactly one seat
+    data.retry_slot_id = "bench-retry-slot"
+    slots.append({
+        "slot_id": data.retry_slot_id, "gym_id": data.hot_gym_id, "start_time": now + timedelta(days=1),
+        "end_time": now + timedelta(days=1, hours=1), "available_capacity": 1_000_000,
+    })
+    data.slot_gym[data.retry_slot_id] = data.hot_gym_id
+
+    orders = []
+    for i in range(counts.orders):
+        slot_id = rng.choice(data.slot_ids)
+        orders.append({
+            "order_id": f"bench-order-{i}", "customer_id": rng.choice(data.customer_ids),
+            "gym_id": data.slot_gym[slot_id], "slot_id": slot_id,
+            "order_time": now - timedelta(minutes=i), "status": "Created",
+        })
+        data.order_ids.append(f"bench-order-{i}")
+
+    async with SessionLocal() as db:
+        await _insert_chunked(db, Customer, customers)
+        await _insert_chunked(db, LoginCredential, credentials)
+        await _insert_chunked(db, GymOwner, owners)
+        await _insert_chunked(db, Gym, gyms)
+        await _insert_chunked(db, Slot, slots)
+        await _insert_chunked(db, Order, orders)
+        await db.commit()
+        # Seeding bypasses the write paths that maintain the occupancy counters
+        await rebuild(db)
+
+    return data
@@ -0,0 +1,99 @@
+"""Serialization cost per endpoint, for each way FastAPI can encode a response.
+
+    python -m benchmarks.serialization
+
+For each endpoint's typical return value this times:
+  encoder         no response model: jsonable_encoder, then json.dumps (the old path)
+  encoder+orjson  no response model, ORJSONResponse as the response class
+  model+orjson    response model validated, dumped to Python, ORJSONResponse renders it
+  model           response model validated and dumped straight to JSON bytes by
+                  pydantic-core, which FastAPI does when the default response class is kept
+"""
+import argparse
+import json
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from .run import REPO_ROOT
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per endpoint and method; the best counts")
+    return parser.parse_args(argv)
+
+
+def per_call_microseconds(call, repeat: int) -> float:
+    timer = timeit.Timer(call)
+    # autorange picks a call count that runs for at least 0.2s, whatever the payload size
+    return min(seconds / number for number, seconds in (timer.autorange() for _ in range(repeat))) * 1e6
+
+
+def endpoint_payloads():
+    """(name, response model, value the handler returns) for a representative set of routes."""
+    from src.customer.customer import SecureRoute
+    from src.customer.login import Registration
+    from src.gym.gym_slot import GymOut
+    from src.models import Customer, Gym, Order
+    from src.models.customer import LoginCredential
+    from src.orders.order import OrderDetails
+    from src.utils.schemas import Message, Token
+    from src.vendor.dashboard import Dashboard
+
+    now = datetime.now()
+    customer = Customer(customer_id="c" * 36, first_name="Ada", last_name="Lovelace", email="ada@example.com",
+                        phone_number="tel:+1-415-555-2671")
+    credential = LoginCredential(credential_id="r" * 36, customer_id="c" * 36, username="ada@example.com",
+                                 password="$2b$12$" + "x" * 53, registration_date=now)
+    gym = Gym(gym_id="g" * 36, name="Gym", address="1 Main Street", capacity=30, owner_id="o" * 36, status="Added")
+    order = Order(order_id="o" * 36, customer_id="c" * 36, gym_id="g" * 36, slot_id="s" * 36, order_time=now,
+                  status="Created")
+    today = date.today()
+    dashboard = {
+        "start": today, "end": today + timedelta(days=30),
+        "days": [
+            {"gym_id": f"gym-{g}", "gym_name": f"Gym {g}", "day": today + timedelta(days=d), "slots": 12,
+             "bookings": 200, "cancellations": 10, "failures": 2, "active": 188, "fill_rate": 0.52}
+            for g in range(10) for d in range(31)
+        ],
+    }
+    return [
+        ("customer_login", Token, {"access_token": "t" * 600, "token_type": "bearer"}),
+        ("customer_signup", Registration, credential),
+        ("secure_route", SecureRoute, {"message": "This is a secure route!", "user": customer}),
+        ("add_gym", GymOut, gym),
+        ("create_order", OrderDetails, order),
+        ("cancel_order", Message, {"message": "Order cancellation accepted"}),
+        ("vendor_dashboard", Dashboard, dashboard),
+    ]
+
+
+def methods(model, value):
+    adapter = TypeAdapter(model)
+    return {
+        "encoder": lambda: json.dumps(jsonable_encoder(value)).encode(),
+        "encoder+orjson": lambda: orjson.dumps(jsonable_encoder(value)),
+        "model+orjson": lambda: orjson.dumps(adapter.dump_python(adapter.validate_python(value), mode="json")),
+        "model": lambda: adapter.dump_json(adapter.validate_python(value)),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, str(REPO_ROOT))
+
+    header = ["endpoint", "encoder", "encoder+orjson", "model+orjson", "model"]
+    print(f"{header[0]:<18}" + "".join(f"{name:>16}" for name in header[1:]) + "   (microseconds per call)")
+    for name, model, value in endpoint_payloads():
+        timings = {method: per_call_microseconds(call, args.repeat) for method, call in methods(model, value).items()}
+        print(f"{name:<18}" + "".join(f"{timings[method]:>16.2f}" for method in header[1:]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
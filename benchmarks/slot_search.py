@@ -0,0 +1,186 @@
+"""Slot search latency by page depth over a million-slot data set.
+
+Seeds --slots slots spread over --gyms gyms, then pages through
+/slots/search by its cursor, with and without a gym filter, timing every
+page. With keyset pagination a page deep in the results should cost the same
+as the first one. For contrast the same pages are read with OFFSET, straight
+from the database. The run fails if the cursor's median latency at the
+deepest sampled depth exceeds --max-growth times the median of the first
+pages.
+
+    python -m benchmarks.slot_search --slots 1000000 --pages 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+from .run import REPO_ROOT, configure_environment, percentile
+from .seed import SeedCounts, seed
+
+INSERT_CHUNK = 10_000
+# Pages averaged around each sampled depth
+SAMPLE = 20
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--slots", type=int, default=1_000_000)
+    parser.add_argument("--gyms", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=2000, help="pages to walk through per query")
+    parser.add_argument("--limit", type=int, default=50, help="slots per page")
+    parser.add_argument("--max-growth", type=float, default=2.0,
+                        help="allowed ratio of deepest to first pages' median latency")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--rate-limits", action="store_true", help="keep rate limiting and load shedding on")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+async def insert_slots(count: int, gym_ids: list, start: datetime):
+    """Bulk insert count slots, one every minute across the gyms, without holding them all in memory."""
+    from sqlalchemy import insert
+    from src.models import Slot
+    from src.models.base import SessionLocal
+
+    async with SessionLocal() as db:
+        for offset in range(0, count, INSERT_CHUNK):
+            rows = []
+            for i in range(offset, min(count, offset + INSERT_CHUNK)):
+                start_time = start + timedelta(minutes=i)
+                rows.append({"slot_id": f"search-slot-{i}", "gym_id": gym_ids[i % len(gym_ids)],
+                             "start_time": start_time, "end_time": start_time + timedelta(hours=1),
+                             # A few full slots the search has to skip
+                             "available_capacity": 0 if i % 7 == 0 else 20})
+            await db.execute(insert(Slot), rows)
+            await db.commit()
+    await analyze()
+
+
+async def analyze():
+    from src.models.base import engine
+
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+
+
+async def walk_cursor(client, headers, params: dict, pages: int) -> list:
+    latencies = []
+    cursor = None
+    for _ in range(pages):
+        start = time.perf_counter()
+        response = await client.get("/slots/search", params={**params, **({"cursor": cursor} if cursor else {})},
+                                    headers=headers)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            break
+    return latencies
+
+
+async def walk_offset(params: dict, depths: list, limit: int) -> list:
+    """The same search paged with OFFSET, timed at each depth."""
+    from sqlalchemy import exists, select
+    from src.models.base import SessionLocal
+    from src.models.gym_slot import Gym, Slot
+
+    query = (
+        select(Slot.slot_id, Slot.gym_id, select(Gym.name).where(Gym.gym_id == Slot.gym_id).scalar_subquery(),
+               Slot.start_time, Slot.end_time, Slot.available_capacity)
+        .where(Slot.start_time >= datetime.fromisoformat(params["start_after"]),
+               Slot.end_time <= datetime.fromisoformat(params["end_before"]), Slot.available_capacity > 0,
+               exists().where(Gym.gym_id == Slot.gym_id, Gym.status == "Added"))
+        .order_by(Slot.start_time, Slot.slot_id)
+    )
+    if "gym_id" in params:
+        query = query.where(Slot.gym_id == params["gym_id"])
+    latencies = []
+    async with SessionLocal() as db:
+        for depth in depths:
+            start = time.perf_counter()
+            (await db.execute(query.offset(depth * limit).limit(limit + 1))).all()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def depth_profile(latencies: list, depths: list) -> dict:
+    """Median latency of the SAMPLE pages at each depth, in ms."""
+    profile = {}
+    for depth in depths:
+        window = sorted(latencies[depth:depth + SAMPLE])
+        if window:
+            profile[depth] = percentile(window, 0.50) * 1000
+    return profile
+
+
+async def benchmark(args):
+    from src.app import app
+    from src.auth.tokens import create_access_token
+
+    counts = SeedCounts(customers=1, owners=1, gyms=args.gyms, slots=0, orders=0, update_slots=0)
+    async with app.router.lifespan_context(app):
+        data = await seed(counts, random.Random(args.seed))
+        window_start = datetime.now() + timedelta(days=1)
+        started = time.perf_counter()
+        await insert_slots(args.slots, data.gym_ids, window_start)
+        print(f"seeded {args.slots} slots in {time.perf_counter() - started:.1f}s", flush=True)
+
+        claims = {"customer_id": data.customer_ids[0], "first_name": "Bench", "last_name": "Customer",
+                  "email": data.customer_emails[0], "phone_number": "tel:+1-415-555-2671"}
+        headers = {"Authorization": "Bearer " + create_access_token(data.customer_emails[0], "customer", claims)}
+        window = {"start_after": window_start.isoformat(),
+                  "end_before": (window_start + timedelta(minutes=args.slots + 120)).isoformat(),
+                  "limit": args.limit}
+        queries = {"all_gyms": window, "one_gym": {**window, "gym_id": data.gym_ids[0]}}
+
+        results = {}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+            for name, params in queries.items():
+                latencies = await walk_cursor(client, headers, params, args.pages)
+                depths = sorted({0, *(d for d in (10, 100, 1000, 10000) if d + SAMPLE <= len(latencies)),
+                                 max(0, len(latencies) - SAMPLE)})
+                offset_latencies = await walk_offset(params, depths, args.limit)
+                results[name] = {
+                    "pages": len(latencies),
+                    "cursor_ms_by_depth": depth_profile(latencies, depths),
+                    "offset_ms_by_depth": {depth: latency * 1000 for depth, latency in zip(depths, offset_latencies)},
+                    "p99_ms": percentile(sorted(latencies), 0.99) * 1000,
+                }
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, str(REPO_ROOT))
+    with tempfile.TemporaryDirectory(prefix="gyg-benchmark-") as workdir:
+        configure_environment(args, Path(workdir))
+        results = asyncio.run(benchmark(args))
+
+    failures = []
+    for name, result in results.items():
+        print(f"{name}: {result['pages']} pages, p99 {result['p99_ms']:.2f}ms")
+        for depth, cursor_ms in result["cursor_ms_by_depth"].items():
+            print(f"  page {depth:>6}  cursor {cursor_ms:>8.2f}ms  offset {result['offset_ms_by_depth'][depth]:>8.2f}ms")
+        profile = result["cursor_ms_by_depth"]
+        growth = profile[max(profile)] / profile[0] if profile[0] else 0.0
+        result["growth"] = growth
+        if growth > args.max_growth:
+            failures.append(f"{name}: page {max(profile)} is {growth:.1f}x slower than the first pages")
+    if args.output:
+        Path(args.output).write_text(json.dumps({"config": vars(args), "queries": results}, indent=2) + "\n")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Compare the request volume a hot slot draws with and without the waitlist.
+
+Fills a slot, then has --contenders customers chase its seats while the
+holders cancel one at a time every --release-interval seconds. In retry mode
+contenders loop on create_order until they get a seat, the way clients did
+before the waitlist; in waitlist mode they join the queue once and long-poll.
+
+    python -m benchmarks.waitlist --contenders 200 --releases 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+from .run import REPO_ROOT, configure_environment, percentile
+from .scenarios import Context, login_principals
+from .seed import SeedCounts, seed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contenders", type=int, default=200)
+    parser.add_argument("--releases", type=int, default=50, help="seats given back during the run")
+    parser.add_argument("--release-interval", type=float, default=0.05)
+    parser.add_argument("--retry-interval", type=float, default=0.05, help="client sleep between retries")
+    parser.add_argument("--grace", type=float, default=2.0, help="seconds contenders keep trying after the last release")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--rate-limits", action="store_true", help="keep rate limiting and load shedding on")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    return parser.parse_args(argv)
+
+
+async def create_slot(data, name: str, capacity: int) -> str:
+    from src.models import Slot
+    from src.models.base import SessionLocal
+
+    start_time = datetime.now() + timedelta(days=2)
+    async with SessionLocal() as db:
+        db.add(Slot(slot_id=name, gym_id=data.hot_gym_id, start_time=start_time,
+                    end_time=start_time + timedelta(hours=1), available_capacity=capacity))
+        await db.commit()
+    return name
+
+
+def order_body(ctx: Context, customer_id: str, slot_id: str) -> dict:
+    return {
+        "order_id": "new", "customer_id": customer_id, "gym_id": ctx.data.hot_gym_id, "slot_id": slot_id,
+        "order_time": (datetime.now() + timedelta(hours=1)).isoformat(), "status": "Created",
+    }
+
+
+async def retry_contender(client, ctx, i, slot_id, deadline, args, stats):
+    customer_id, headers = ctx.customer(i)
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        response = await client.post("/order/create_order/", json=order_body(ctx, customer_id, slot_id), headers=headers)
+        stats["requests"] += 1
+        if response.status_code == 200:
+            stats["seated"].append(time.perf_counter() - started)
+            return
+        await asyncio.sleep(args.retry_interval * (0.5 + ctx.rng.random()))
+
+
+async def waitlist_contender(client, ctx, i, slot_id, deadline, args, stats):
+    customer_id, headers = ctx.customer(i)
+    started = time.perf_counter()
+    response = await client.post(
+        "/order/create_order/", params={"join_waitlist": "true"}, json=order_body(ctx, customer_id, slot_id),
+        headers=headers,
+    )
+    stats["requests"] += 1
+    if response.status_code == 200:
+        stats["seated"].append(time.perf_counter() - started)
+        return
+    entry_id = response.json()["entry_id"]
+    stats["joined"].append((entry_id, i))
+    while (remaining := deadline - time.perf_counter()) > 0:
+        response = await client.get(f"/order/waitlist/{entry_id}", params={"wait": min(remaining, 30)}, headers=headers)
+        stats["requests"] += 1
+        if response.json()["status"] == "Promoted":
+            stats["seated"].append(time.perf_counter() - started)
+            stats["promoted"].append(entry_id)
+            return
+
+
+async def run_mode(client, ctx, args, mode: str, holders: int) -> dict:
+    slot_id = await create_slot(ctx.data, f"bench-waitlist-{mode}", holders)
+    orders = []
+    for i in range(holders):
+        customer_id, headers = ctx.customer(i)
+        response = await client.post("/order/create_order/", json=order_body(ctx, customer_id, slot_id), headers=headers)
+        response.raise_for_status()
+        orders.append((response.json()["order_id"], headers))
+
+    stats = {"requests": 0, "seated": [], "joined": [], "promoted": []}
+    deadline = time.perf_counter() + args.releases * args.release_interval + args.grace
+    contender = retry_contender if mode == "retry" else waitlist_contender
+
+    async def release():
+        for order_id, headers in orders[:args.releases]:
+            await asyncio.sleep(args.release_interval)
+            (await client.put(f"/order/cancel_order/{order_id}", headers=headers)).raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        release(),
+        *(contender(client, ctx, holders + i, slot_id, deadline, args, stats) for i in range(args.contenders)),
+    )
+    elapsed = time.perf_counter() - started
+
+    seated = sorted(stats["seated"])
+    result = {
+        "requests": stats["requests"],
+        "seats_won": len(seated),
+        "requests_per_seat": stats["requests"] / len(seated) if seated else None,
+        "seconds": elapsed,
+        "time_to_seat_p50_ms": percentile(seated, 0.50) * 1000,
+        "time_to_seat_p95_ms": percentile(seated, 0.95) * 1000,
+    }
+    if mode == "waitlist":
+        # FIFO holds if the winners are exactly the earliest entries in the queue
+        joined = sorted(entry_id for entry_id, _ in stats["joined"])
+        result["fifo"] = sorted(stats["promoted"]) == joined[:len(stats["promoted"])]
+    return result
+
+
+async def benchmark(args):
+    from src.app import app
+
+    holders = args.releases
+    counts = SeedCounts(customers=holders + args.contenders, owners=1, gyms=1, slots=1, orders=0, update_slots=0)
+    async with app.router.lifespan_context(app):
+        data = await seed(counts, random.Random(args.seed))
+        ctx = Context(data=data, run_id=str(int(time.time())), rng=random.Random(args.seed))
+        limits = httpx.Limits(max_connections=args.contenders + 10)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", limits=limits,
+                                     timeout=60) as client:
+            await login_principals(client, ctx, holders + args.contenders)
+            results = {}
+            for mode in ("retry", "waitlist"):
+                results[mode] = await run_mode(client, ctx, args, mode, holders)
+                print(f"{mode:<9} {json.dumps(results[mode])}", flush=True)
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sys.path.insert(0, str(REPO_ROOT))
+    with tempfile.TemporaryDirectory(prefix="gyg-benchmark-") as workdir:
+        configure_environment(args, Path(workdir))
+        results = asyncio.run(benchmark(args))
+    if args.output:
+        Path(args.output).write_text(json.dumps({"config": vars(args), "modes": results}, indent=2) + "\n")
+    return 0 if results["waitlist"].get("fifo", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
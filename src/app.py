@@ -3,18 +3,75 @@ from .customer.customer import user_router
 from .customer.login import login_router
 from .orders.order import order_router
 from .gym.gym_slot import gym_router
+from .gym.bulk import bulk_router
 from .vendor.login import vendor_router
-from .models.base import create_tables
+from .vendor.dashboard import dashboard_router
+from .slots.search import slot_router
+from .models.base import create_tables, get_pool_status
+from .auth.tokens import load_keys, principal_cache
+from .auth.revocations import revocations
+from .auth import passwords
+from .gym.catalog import catalog
+from .orders.events import consumer as order_event_consumer
+from .ratelimit.limiter import limiter
+from .orders.waitlist import notifier as waitlist_notifier
+from .orders.idempotency import store as idempotency_store
+from .metrics.instrumentation import metrics_router, record_request_metrics, registry
 
 
 app = FastAPI()
+app.middleware("http")(record_request_metrics)
+
+registry.register_collector("db_pool", get_pool_status)
+registry.register_collector("catalog_cache", catalog.stats)
+registry.register_collector("auth_cache", principal_cache.stats)
+registry.register_collector("revocations", revocations.stats)
+registry.register_collector("password_hash", passwords.stats)
+registry.register_collector("order_events", order_event_consumer.stats)
+registry.register_collector("rate_limit", limiter.stats)
+registry.register_collector("waitlist", waitlist_notifier.stats)
+registry.register_collector("idempotency", idempotency_store.stats)
 
 app.include_router(user_router)
 app.include_router(login_router)
 app.include_router(order_router)
 app.include_router(gym_router)
+app.include_router(bulk_router)
 app.include_router(vendor_router)
+app.include_router(dashboard_router)
+app.include_router(slot_router)
+app.include_router(metrics_router)
+
+@app.on_event("startup")
+async def init_db():
+    await create_tables()
+
+@app.on_event("startup")
+def init_auth():
+    # Fail fast on missing or malformed keys instead of on the first request
+    load_keys()
+
+@app.on_event("startup")
+async def start_revocation_sync():
+    await revocations.start()
+
+@app.on_event("startup")
+def start_order_events():
+    # Also replays any events left pending by a previous run
+    order_event_consumer.start()
 
 @app.on_event("startup")
-def init_db():
-    create_tables()
\ No newline at end of file
+def start_idempotency_purge():
+    idempotency_store.start()
+
+@app.on_event("shutdown")
+async def stop_order_events():
+    await order_event_consumer.stop()
+
+@app.on_event("shutdown")
+async def stop_revocation_sync():
+    await revocations.stop()
+
+@app.on_event("shutdown")
+async def stop_idempotency_purge():
+    await idempotency_store.stop()
@@ -0,0 +1,143 @@
+"""Token revocation shared between workers.
+
+Revocations are rows in the Revocation table, kept until every token they
+cover has expired. Each worker mirrors the table in memory and polls it for
+new rows, so checking a token never waits on the database. A revocation made
+on one worker applies there at once and on the others within sync_interval.
+
+Each poll re-reads every row revoked since sync_margin seconds before the
+previous poll, not just the rows with a higher id than any seen: on a server
+database ids are assigned at insert, so a row can commit after one with a
+higher id was already read. Applying a row twice is harmless.
+Entries leave the mirror only when they expire, never to make room, so a
+revoked token cannot become valid again while it is still unexpired.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from src.models.base import SessionLocal
+from src.models.revocation import Revocation
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_SYNC_INTERVAL = float(os.environ.get("REVOCATION_SYNC_INTERVAL", 1.0))
+# How late a revocation may commit after its revoked_at, clock skew between
+# workers included, and still be picked up by the others
+REVOCATION_SYNC_MARGIN = float(os.environ.get("REVOCATION_SYNC_MARGIN", 60.0))
+# Syncs between deletions of expired rows
+PURGE_EVERY = 60
+
+
+class RevocationList:
+    """Revoked tokens and principals, from the database and mirrored in this worker."""
+
+    def __init__(self, session_factory: async_sessionmaker, sync_interval: float = REVOCATION_SYNC_INTERVAL,
+                 sync_margin: float = REVOCATION_SYNC_MARGIN):
+        self.session_factory = session_factory
+        self.sync_interval = sync_interval
+        self.sync_margin = sync_margin
+        # jti -> expires_at
+        self._tokens: Dict[str, float] = {}
+        # (role, subject) -> (revoked_at, expires_at)
+        self._principals: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        # When the previous sync started; None until the first, which loads every row
+        self._last_sync: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self.syncs = 0
+        self.purged = 0
+
+    def is_revoked(self, claims: dict) -> bool:
+        if claims.get("jti") in self._tokens:
+            return True
+        revoked = self._principals.get((claims.get("role"), claims.get("sub")))
+        return revoked is not None and claims.get("iat", 0) <= revoked[0]
+
+    async def revoke_token(self, claims: dict):
+        await self._add(Revocation(jti=claims["jti"], role=claims["role"], subject=claims["sub"],
+                                   revoked_at=time.time(), expires_at=claims["exp"]))
+
+    async def revoke_principal(self, role: str, subject: str, max_token_lifetime: float):
+        """Revoke every token issued to a principal so far; none lives longer than max_token_lifetime seconds."""
+        now = time.time()
+        await self._add(Revocation(role=role, subject=subject, revoked_at=now, expires_at=now + max_token_lifetime))
+
+    async def _add(self, revocation: Revocation):
+        async with self.session_factory() as db:
+            db.add(revocation)
+            await db.commit()
+        self._apply(revocation)
+
+    def _apply(self, revocation: Revocation):
+        if revocation.jti is not None:
+            self._tokens[revocation.jti] = revocation.expires_at
+            return
+        key = (revocation.role, revocation.subject)
+        current = self._principals.get(key)
+        if current is None or current[0] < revocation.revoked_at:
+            self._principals[key] = (revocation.revoked_at, revocation.expires_at)
+
+    async def sync(self):
+        """Pick up revocations added since the last sync, by any worker, and forget expired ones."""
+        started = time.time()
+        query = select(Revocation).where(Revocation.expires_at > started)
+        if self._last_sync is not None:
+            query = query.where(Revocation.revoked_at >= self._last_sync - self.sync_margin)
+        async with self.session_factory() as db:
+            rows = (await db.scalars(query)).all()
+        for revocation in rows:
+            self._apply(revocation)
+        self._last_sync = started
+        now = time.time()
+        self._tokens = {jti: expires_at for jti, expires_at in self._tokens.items() if expires_at > now}
+        self._principals = {key: value for key, value in self._principals.items() if value[1] > now}
+        self.syncs += 1
+
+    async def start(self):
+        # Load what other workers and earlier runs revoked before serving any request
+        await self.sync()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+                if self.syncs % PURGE_EVERY == 0:
+                    await self.purge()
+            except Exception:
+                logger.exception("failed to sync revocations")
+
+    async def purge(self):
+        async with self.session_factory() as db:
+            result = await db.execute(delete(Revocation).where(Revocation.expires_at <= time.time()))
+            await db.commit()
+        self.purged += result.rowcount
+
+    def clear(self):
+        self._tokens.clear()
+        self._principals.clear()
+        self._last_sync = None
+
+    def stats(self) -> dict:
+        return {
+            "tokens": len(self._tokens),
+            "principals": len(self._principals),
+            "syncs": self.syncs,
+            "purged": self.purged,
+        }
+
+
+revocations = RevocationList(SessionLocal)
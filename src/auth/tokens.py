@@ -0,0 +1,93 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import jwt
+from jwt.algorithms import get_default_algorithms
+from src.utils import generate_id
+from src.utils.cache import TTLCache
+from .revocations import revocations
+
+ALGORITHM = "RS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 30
+DEFAULT_TOKEN_EXPIRE_MINUTES = 15
+
+# Verified claims keyed by the raw token, so a hit skips signature verification
+principal_cache = TTLCache(
+    maxsize=int(os.environ.get("AUTH_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("AUTH_CACHE_TTL", 300)),
+)
+# Longest-lived token we hand out, so a principal's revocation can expire after it
+MAX_TOKEN_LIFETIME = timedelta(minutes=max(ACCESS_TOKEN_EXPIRE_MINUTES, DEFAULT_TOKEN_EXPIRE_MINUTES))
+
+_private_key = None
+_public_key = None
+
+
+def load_keys():
+    """Parse the RSA key pair from the environment once and keep the key objects."""
+    global _private_key, _public_key
+    private_key = os.environ.get("JWT_PRIVATE_KEY")
+    if not private_key:
+        raise ValueError("JWT_PRIVATE_KEY environment variable not set")
+    public_key = os.environ.get("JWT_PUBLIC_KEY")
+    if not public_key:
+        raise ValueError("JWT_PUBLIC_KEY environment variable not set")
+
+    rsa = get_default_algorithms()[ALGORITHM]
+    _private_key = rsa.prepare_key(private_key)
+    _public_key = rsa.prepare_key(public_key)
+
+
+def _keys():
+    if _private_key is None or _public_key is None:
+        load_keys()
+    return _private_key, _public_key
+
+
+def create_access_token(subject: str, role: str, claims: Optional[dict] = None,
+                        expires_delta: Optional[timedelta] = None):
+    private_key, _ = _keys()
+    # Capped, so a revocation of the principal always outlives the token
+    lifetime = min(expires_delta or timedelta(minutes=DEFAULT_TOKEN_EXPIRE_MINUTES), MAX_TOKEN_LIFETIME)
+    expire = datetime.now(timezone.utc) + lifetime
+    to_encode = dict(claims or {})
+    to_encode.update({
+        "sub": subject,
+        "role": role,
+        "jti": generate_id(),
+        # Sub-second precision so a token issued right after a password change stays valid
+        "iat": time.time(),
+        "exp": expire,
+    })
+    return jwt.encode(to_encode, private_key, algorithm=ALGORITHM)
+
+
+def decode_access_token(token: str, role: str) -> dict:
+    """Return the verified claims of token, raising jwt.InvalidTokenError subclasses on failure."""
+    claims = principal_cache.get(token)
+    if claims is None:
+        _, public_key = _keys()
+        claims = jwt.decode(token, public_key, algorithms=[ALGORITHM])
+        # Never cache past expiry, so expired tokens go back through jwt.decode and fail there
+        ttl = min(principal_cache.ttl, claims["exp"] - time.time())
+        if ttl > 0:
+            principal_cache.set(token, claims, ttl=ttl)
+
+    if claims.get("role") != role or claims.get("sub") is None:
+        raise jwt.InvalidTokenError("Token was not issued for this role")
+    if revocations.is_revoked(claims):
+        raise jwt.InvalidTokenError("Token has been revoked")
+    return claims
+
+
+async def revoke_token(claims: dict):
+    """Invalidate a single token, e.g. on logout."""
+    await revocations.revoke_token(claims)
+    principal_cache.discard_where(lambda cached: cached.get("jti") == claims["jti"])
+
+
+async def revoke_principal(role: str, subject: str):
+    """Invalidate every token issued so far to a principal, e.g. on password change."""
+    await revocations.revoke_principal(role, subject, MAX_TOKEN_LIFETIME.total_seconds())
+    principal_cache.discard_where(lambda cached: cached.get("role") == role and cached.get("sub") == subject)
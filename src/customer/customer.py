@@ -1,6 +1,16 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from .login import get_current_user
+from src.models.base import get_db
 from src.models.customer import Customer
+from src.models.gym_slot import Gym, Slot
+from src.models.order import Order
+from src.orders.order import Status
+from src.utils.pagination import encode_cursor, decode_cursor
 
 user_router = APIRouter(
     prefix="/customer",
@@ -9,7 +19,82 @@ user_router = APIRouter(
     responses={403: {"description": "Forbidden"}},
 )
 
+MAX_HISTORY_PAGE_SIZE = 1000
+
+class CustomerProfile(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    customer_id: str
+    first_name: str
+    last_name: str
+    email: str
+    phone_number: str
+
+
+class SecureRoute(BaseModel):
+    message: str
+    user: CustomerProfile
+
+
 # Protected route that requires authentication
-@user_router.get("/secure-route/")
+@user_router.get("/secure-route/", response_model=SecureRoute)
 async def secure_route(current_user: Customer = Depends(get_current_user)):
-    return {"message": "This is a secure route!", "user": current_user}
\ No newline at end of file
+    return {"message": "This is a secure route!", "user": current_user}
+
+
+class OrderHistoryItem(BaseModel):
+    order_id: str
+    order_time: datetime
+    status: Status
+    gym_id: str
+    gym_name: str
+    slot_id: str
+    # None once the order's slot no longer exists
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+
+
+class OrderHistoryPage(BaseModel):
+    items: List[OrderHistoryItem]
+    next_cursor: Optional[str] = None
+
+
+@user_router.get("/orders", response_model=OrderHistoryPage)
+async def order_history(
+    status: Optional[List[Status]] = Query(None),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_HISTORY_PAGE_SIZE),
+    current_user: Customer = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # A single query joins in the gym name and slot times, newest orders first;
+    # (customer_id, order_time) is indexed, so each page is a short range scan.
+    # The slot is outer joined so an order outlives the slot it was booked on
+    query = (
+        select(
+            Order.order_id,
+            Order.order_time,
+            Order.status,
+            Order.gym_id,
+            Gym.name.label("gym_name"),
+            Order.slot_id,
+            Slot.start_time,
+            Slot.end_time,
+        )
+        .join(Gym, Gym.gym_id == Order.gym_id)
+        .outerjoin(Slot, Slot.slot_id == Order.slot_id)
+        .where(Order.customer_id == current_user.customer_id)
+    )
+    if status:
+        query = query.where(Order.status.in_([s.value for s in status]))
+    if cursor:
+        query = query.where(tuple_(Order.order_time, Order.order_id) < decode_cursor(cursor))
+
+    # One extra row tells us whether there is another page
+    query = query.order_by(Order.order_time.desc(), Order.order_id.desc()).limit(limit + 1)
+    # A page is at most MAX_HISTORY_PAGE_SIZE rows; longer histories are
+    # walked by cursor, so memory is bounded by the page, not the history
+    rows = (await db.execute(query)).all()
+    next_cursor = encode_cursor(rows[limit - 1].order_time, rows[limit - 1].order_id) if len(rows) > limit else None
+    return OrderHistoryPage(items=[OrderHistoryItem.model_validate(row._mapping) for row in rows[:limit]],
+                            next_cursor=next_cursor)
@@ -1,27 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from typing import Optional
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr
 from pydantic_extra_types.phone_numbers import PhoneNumber
 import jwt
 import re
 from src.models.base import get_db
 from src.models.customer import Customer, LoginCredential
-from sqlalchemy.orm import Session
-import os
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.utils import generate_id
+from src.utils.schemas import Message, Token
+from src.auth.passwords import hash_password, verify_and_update
+from src.ratelimit.limiter import limit, login_principal
+from src.auth.tokens import (
+    ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, decode_access_token, revoke_token, revoke_principal,
+)
 
 
-SECRET_KEY = os.environ.get("SECRET_KEY", "default")
-if not SECRET_KEY:
-    raise ValueError("SECRET_KEY environment variable not set")
-
-ALGORITHM = "RS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ROLE = "customer"
+# Profile fields carried in the token so requests can skip the database
+PRINCIPAL_CLAIMS = ("customer_id", "first_name", "last_name", "email", "phone_number")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 login_router = APIRouter(
@@ -36,21 +36,19 @@ class User(BaseModel):
     email: EmailStr
     phone_number: PhoneNumber
 
-# Dependency to get the current user from the JWT token
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# What signup reports back; the password hash stays on the server
+class Registration(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    credential_id: str
+    customer_id: str
+    username: str
+    registration_date: datetime
+
+# Dependency to get the verified claims of the bearer token
+async def get_token_claims(token: str = Depends(oauth2_scheme)):
     try:
-        public_key = os.environ.get("JWT_PUBLIC_KEY")
-        if not public_key:
-            raise ValueError("JWT_PUBLIC_KEY environment variable not set")
-
-        payload = jwt.decode(token, public_key, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+        return decode_access_token(token, ROLE)
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -64,49 +62,32 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(Customer).filter(Customer.email == email).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    return user
-
-# Hashing and verifying passwords
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-# Create a new JWT token
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    private_key = os.environ.get("JWT_PRIVATE_KEY", "default")
-    if not private_key:
-        raise ValueError("JWT_PRIVATE_KEY environment variable not set")
-
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, private_key, algorithm=ALGORITHM)
-    return encoded_jwt
+# Dependency to get the current user from the JWT token, without a database round trip
+async def get_current_user(claims: dict = Depends(get_token_claims)):
+    return Customer(**{name: claims.get(name) for name in PRINCIPAL_CLAIMS})
 
 # Login route
-@login_router.post("/login")
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(Customer).filter(Customer.email == form_data.username).first()
+@login_router.post("/login", response_model=Token, dependencies=[limit("customer_login", login_principal)])
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(Customer).where(Customer.email == form_data.username))
     if user:
-        login_credential = db.query(LoginCredential).filter(LoginCredential.customer_id == user.customer_id).first()
-        password_hash = login_credential.password if login_credential else None
-
-        if password_hash and verify_password(form_data.password, password_hash):
+        login_credential = await db.scalar(
+            select(LoginCredential).where(LoginCredential.customer_id == user.customer_id)
+        )
+        valid, new_hash = (False, None)
+        if login_credential:
+            valid, new_hash = await verify_and_update(form_data.password, login_credential.password)
+
+        if valid:
+            if new_hash:
+                # The configured work factor changed since this hash was stored
+                login_credential.password = new_hash
+                await db.commit()
             access_token = create_access_token(
-                data={"sub": form_data.username}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+                subject=user.email,
+                role=ROLE,
+                claims={name: getattr(user, name) for name in PRINCIPAL_CLAIMS},
+                expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
             )
             return {"access_token": access_token, "token_type": "bearer"}
 
@@ -116,18 +97,17 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-@login_router.post("/signup/")
-def signup(customer: User, password: str, db: Session = Depends(get_db)):
-    existing_customer = db.query(Customer).filter(Customer.email == customer.email).first()
+@login_router.post("/signup/", response_model=Registration, dependencies=[limit("customer_signup")])
+async def signup(customer: User, password: str, db: AsyncSession = Depends(get_db)):
+    existing_customer = await db.scalar(select(Customer.customer_id).where(Customer.email == customer.email))
     if existing_customer:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(password)
+    hashed_password = await hash_password(password)
 
     new_customer = Customer(**customer.model_dump(), customer_id=generate_id())
     db.add(new_customer)
-    db.commit()
-    db.refresh(new_customer)
+    await db.commit()
 
     new_login_credential = LoginCredential(
         username=customer.email,
@@ -138,7 +118,26 @@ def signup(customer: User, password: str, db: Session = Depends(get_db)):
     )
 
     db.add(new_login_credential)
-    db.commit()
-    db.refresh(new_login_credential)
+    await db.commit()
 
     return new_login_credential
+
+@login_router.post("/logout", response_model=Message)
+async def logout(claims: dict = Depends(get_token_claims)):
+    await revoke_token(claims)
+    return {"message": "Logged out"}
+
+@login_router.put("/change_password", response_model=Message)
+async def change_password(old_password: str, new_password: str, db: AsyncSession = Depends(get_db),
+                          current_user: Customer = Depends(get_current_user)):
+    login_credential = await db.scalar(
+        select(LoginCredential).where(LoginCredential.customer_id == current_user.customer_id)
+    )
+    if not login_credential or not (await verify_and_update(old_password, login_credential.password))[0]:
+        raise HTTPException(status_code=400, detail="Incorrect password")
+
+    login_credential.password = await hash_password(new_password)
+    await db.commit()
+    # Tokens issued with the old password must stop working
+    await revoke_principal(ROLE, current_user.email)
+    return {"message": "Password changed successfully"}
@@ -0,0 +1,324 @@
+import csv
+import json
+import time
+from collections import Counter
+from datetime import date, datetime, time as time_of_day, timedelta
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.metrics.instrumentation import expect_repeated_queries
+from src.models.base import get_db
+from src.models.customer import Customer
+from src.models.gym_slot import Gym, Slot
+from src.models.order import Order
+from src.orders.events import HOLDING_STATUSES
+from src.orders.order import Status
+from src.orders.occupancy import OccupancyDeltas, record_changes
+from src.models.vendors import GymOwner
+from src.vendor.login import get_current_user
+from src.utils import generate_id
+from .catalog import catalog
+
+bulk_router = APIRouter(
+    prefix="/gym",
+    tags=["gym"],
+    dependencies=[Depends(get_current_user)],
+    responses={403: {"description": "Forbidden"}},
+)
+
+# Rows per executemany round trip; also bounds how much we hold in memory
+CHUNK_SIZE = 1000
+MAX_SCHEDULE_DAYS = 366
+MAX_REPORTED_ERRORS = 20
+READ_SIZE = 64 * 1024
+# An order is a few hundred bytes; anything far longer is rejected rather than buffered
+MAX_LINE_BYTES = 16 * 1024
+
+
+class RecurrenceSpec(BaseModel):
+    start_date: date
+    end_date: date
+    days: List[int] = Field(min_length=1, description="Weekdays to schedule, 0 is Monday")
+    start_times: List[time_of_day] = Field(min_length=1)
+    duration_minutes: int = Field(gt=0)
+    capacity: int = Field(gt=0)
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.end_date < self.start_date:
+            raise ValueError("end_date must not be before start_date")
+        if (self.end_date - self.start_date).days >= MAX_SCHEDULE_DAYS:
+            raise ValueError(f"schedules are limited to {MAX_SCHEDULE_DAYS} days")
+        if any(day < 0 or day > 6 for day in self.days):
+            raise ValueError("days must be between 0 (Monday) and 6 (Sunday)")
+        return self
+
+
+class ImportedOrder(BaseModel):
+    order_id: Optional[str] = None
+    customer_id: str
+    gym_id: str
+    slot_id: str
+    order_time: datetime
+    status: Status
+
+
+class BulkReport(BaseModel):
+    inserted: int
+    rejected: int = 0
+    errors: List[str] = []
+    seconds: float
+    rows_per_second: float
+
+
+def iter_slots(gym_id: str, spec: RecurrenceSpec):
+    days = set(spec.days)
+    duration = timedelta(minutes=spec.duration_minutes)
+    day = spec.start_date
+    while day <= spec.end_date:
+        if day.weekday() in days:
+            for start in spec.start_times:
+                start_time = datetime.combine(day, start)
+                yield {
+                    "slot_id": generate_id(),
+                    "gym_id": gym_id,
+                    "start_time": start_time,
+                    "end_time": start_time + duration,
+                    "available_capacity": spec.capacity,
+                }
+        day += timedelta(days=1)
+
+
+async def insert_orders(db: AsyncSession, chunk: List[Tuple[int, dict]]) -> Tuple[int, List[str]]:
+    """Insert the valid orders of a chunk of (line_number, row).
+
+    Returns how many were inserted and an error for each rejected line. Ids,
+    slots and customers are checked with one lookup each per chunk. An order
+    in a status that holds a seat takes one from its slot, as a booking does,
+    so cancelling it later cannot give back a seat that was never taken; such
+    orders are rejected once their slot is full.
+    """
+    order_ids = {row["order_id"] for _, row in chunk}
+    existing = set((await db.scalars(select(Order.order_id).where(Order.order_id.in_(order_ids)))).all())
+    slot_rows = (await db.execute(
+        select(Slot.slot_id, Slot.gym_id, Slot.start_time, Slot.available_capacity)
+        .where(Slot.slot_id.in_({row["slot_id"] for _, row in chunk}))
+    )).all()
+    slots = {slot_id: (gym_id, start_time) for slot_id, gym_id, start_time, _ in slot_rows}
+    seats_left = {slot_id: available_capacity or 0 for slot_id, _, _, available_capacity in slot_rows}
+    customers = set((await db.scalars(
+        select(Customer.customer_id).where(Customer.customer_id.in_({row["customer_id"] for _, row in chunk}))
+    )).all())
+
+    rows, line_numbers, errors = [], [], []
+    seats_taken = Counter()
+    for line_number, row in chunk:
+        slot = slots.get(row["slot_id"])
+        if row["order_id"] in existing:
+            errors.append(f"line {line_number}: order {row['order_id']} already exists")
+        elif slot is None or slot[0] != row["gym_id"]:
+            errors.append(f"line {line_number}: slot {row['slot_id']} is not a slot of gym {row['gym_id']}")
+        elif row["customer_id"] not in customers:
+            errors.append(f"line {line_number}: customer {row['customer_id']} does not exist")
+        elif row["status"] in HOLDING_STATUSES and seats_taken[row["slot_id"]] >= seats_left[row["slot_id"]]:
+            errors.append(f"line {line_number}: slot {row['slot_id']} is full")
+        else:
+            if row["status"] in HOLDING_STATUSES:
+                seats_taken[row["slot_id"]] += 1
+            # Also catches an id repeated within the upload
+            existing.add(row["order_id"])
+            rows.append(row)
+            line_numbers.append(line_number)
+    if not rows:
+        return 0, errors
+
+    # Imported orders count on the day of their slot
+    deltas = OccupancyDeltas()
+    for row in rows:
+        deltas.add_order(row["gym_id"], slots[row["slot_id"]][1].date(), row["status"])
+    try:
+        # The same conditional decrement as a booking, once per slot
+        for slot_id, seats in seats_taken.items():
+            result = await db.execute(
+                update(Slot)
+                .where(Slot.slot_id == slot_id, Slot.available_capacity >= seats)
+                .values(available_capacity=Slot.available_capacity - seats)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                # Seats were booked after the check above
+                await db.rollback()
+                return 0, errors + [f"line {line_number}: a slot filled up meanwhile, retry it"
+                                    for line_number in line_numbers]
+        await db.execute(insert(Order), rows)
+        await record_changes(db, deltas)
+        # Commit per chunk so a large import does not hold the writer lock throughout
+        await db.commit()
+    except IntegrityError:
+        # Another request wrote one of these ids after the check above
+        await db.rollback()
+        return 0, errors + [f"line {line_number}: conflicts with an order written meanwhile, retry it"
+                            for line_number in line_numbers]
+    return len(rows), errors
+
+
+def report(inserted: int, started: float, rejected: int = 0, errors: Optional[List[str]] = None) -> BulkReport:
+    seconds = time.perf_counter() - started
+    return BulkReport(
+        inserted=inserted,
+        rejected=rejected,
+        errors=errors or [],
+        seconds=seconds,
+        rows_per_second=inserted / seconds if seconds > 0 else 0.0,
+    )
+
+
+@bulk_router.post("/{gym_id}/slots/generate", response_model=BulkReport)
+async def generate_slots(gym_id: str, spec: RecurrenceSpec, db: AsyncSession = Depends(get_db),
+                         current_user: GymOwner = Depends(get_current_user)):
+    gym = await catalog.get_gym(db, gym_id)
+    if not gym:
+        raise HTTPException(status_code=404, detail="Gym not found")
+    if gym.owner_id != current_user.owner_id:
+        raise HTTPException(status_code=403, detail="You don't have permission to update this gym")
+
+    started = time.perf_counter()
+    inserted = 0
+    chunk = []
+    deltas = OccupancyDeltas()
+    for slot in iter_slots(gym_id, spec):
+        chunk.append(slot)
+        deltas.add(gym_id, slot["start_time"].date(), "slots")
+        if len(chunk) == CHUNK_SIZE:
+            await db.execute(insert(Slot), chunk)
+            inserted += len(chunk)
+            chunk = []
+    if chunk:
+        await db.execute(insert(Slot), chunk)
+        inserted += len(chunk)
+    await record_changes(db, deltas)
+    # The whole schedule lands or none of it does
+    await db.commit()
+
+    return report(inserted, started)
+
+
+async def iter_lines(upload: UploadFile):
+    """Yield the raw lines of an upload without reading it into memory.
+
+    A line longer than MAX_LINE_BYTES is yielded cut to MAX_LINE_BYTES + 1
+    bytes and the rest of it skipped, so a file without newlines is never
+    buffered whole; callers reject such lines. Decoding is left to callers,
+    so one bad line cannot fail the upload.
+    """
+    pending = b""
+    skipping = False
+    while True:
+        data = await upload.read(READ_SIZE)
+        if not data:
+            break
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if skipping:
+                # The end of a line already yielded cut short
+                skipping = False
+                continue
+            yield line
+        if len(pending) > MAX_LINE_BYTES:
+            if not skipping:
+                yield pending[:MAX_LINE_BYTES + 1]
+                skipping = True
+            pending = b""
+    if pending and not skipping:
+        yield pending
+
+
+def decode_line(line: bytes) -> str:
+    if len(line) > MAX_LINE_BYTES:
+        raise ValueError(f"line is longer than {MAX_LINE_BYTES} bytes")
+    return line.decode("utf-8").rstrip("\r")
+
+
+async def iter_records(upload: UploadFile):
+    """Yield (line_number, line, header) from an NDJSON or CSV upload.
+
+    header is None for NDJSON. CSV uploads need a header row and cannot
+    contain quoted newlines.
+    """
+    is_csv = (upload.filename or "").lower().endswith(".csv") or upload.content_type == "text/csv"
+    header = None
+    line_number = 0
+    async for line in iter_lines(upload):
+        line_number += 1
+        if not line.strip():
+            continue
+        if not is_csv:
+            yield line_number, line, None
+        elif header is None:
+            try:
+                header = next(csv.reader([decode_line(line)]))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid CSV header: {e}")
+        else:
+            yield line_number, line, header
+
+
+def parse_record(line: bytes, header: Optional[List[str]]) -> ImportedOrder:
+    text = decode_line(line)
+    if header is None:
+        return ImportedOrder.model_validate(json.loads(text))
+    return ImportedOrder.model_validate(dict(zip(header, next(csv.reader([text])))))
+
+
+@bulk_router.post("/orders/import", response_model=BulkReport)
+async def import_orders(file: UploadFile, db: AsyncSession = Depends(get_db),
+                        current_user: GymOwner = Depends(get_current_user)):
+    # Every chunk repeats the same batched lookups; that is not an N+1
+    expect_repeated_queries()
+    owned_gyms = set((await db.scalars(select(Gym.gym_id).where(Gym.owner_id == current_user.owner_id))).all())
+
+    started = time.perf_counter()
+    inserted = 0
+    rejected = 0
+    errors = []
+    chunk = []
+    async for line_number, line, header in iter_records(file):
+        try:
+            # UnicodeDecodeError and JSONDecodeError are ValueErrors too
+            order = parse_record(line, header)
+        except (ValueError, ValidationError) as e:
+            order = None
+            error = f"line {line_number}: {e}"
+        else:
+            if order.gym_id not in owned_gyms:
+                error = f"line {line_number}: gym {order.gym_id} is not yours"
+                order = None
+
+        if order is None:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(error)
+            continue
+
+        row = order.model_dump()
+        row["order_id"] = row["order_id"] or generate_id()
+        row["status"] = order.status.value
+        chunk.append((line_number, row))
+        if len(chunk) == CHUNK_SIZE:
+            count, chunk_errors = await insert_orders(db, chunk)
+            inserted += count
+            rejected += len(chunk_errors)
+            errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+            chunk = []
+
+    if chunk:
+        count, chunk_errors = await insert_orders(db, chunk)
+        inserted += count
+        rejected += len(chunk_errors)
+        errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+
+    return report(inserted, started, rejected, errors)
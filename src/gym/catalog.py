@@ -0,0 +1,114 @@
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models.gym_slot import Gym, Slot
+from src.utils.cache import TTLCache
+
+
+# Detached snapshots, safe to share between sessions. Slot capacity is left out
+# on purpose: it changes with every booking and is always read from the database.
+@dataclass(frozen=True)
+class GymInfo:
+    gym_id: str
+    name: str
+    address: str
+    capacity: int
+    status: str
+    owner_id: Optional[str]
+
+
+@dataclass(frozen=True)
+class SlotInfo:
+    slot_id: str
+    gym_id: str
+    start_time: datetime
+    end_time: datetime
+
+
+class InvalidationBackend(ABC):
+    """Carries invalidations between processes that each hold a CatalogCache."""
+
+    @abstractmethod
+    def publish(self, kind: str, key: str):
+        """Deliver an invalidation of (kind, key) to every subscriber."""
+
+    @abstractmethod
+    def subscribe(self, callback: Callable[[str, str], None]):
+        """Call callback(kind, key) for every invalidation published from now on."""
+
+
+class LocalInvalidationBackend(InvalidationBackend):
+    """Delivers invalidations to subscribers in this process only."""
+
+    def __init__(self):
+        self._subscribers: List[Callable[[str, str], None]] = []
+
+    def publish(self, kind: str, key: str):
+        for callback in self._subscribers:
+            callback(kind, key)
+
+    def subscribe(self, callback: Callable[[str, str], None]):
+        self._subscribers.append(callback)
+
+
+class CatalogCache:
+    """Read-through cache for gym and slot metadata, invalidated on writes."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60, backend: Optional[InvalidationBackend] = None):
+        self.gyms = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.slots = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.use_backend(backend or LocalInvalidationBackend())
+
+    def use_backend(self, backend: InvalidationBackend):
+        self.backend = backend
+        backend.subscribe(self._on_invalidate)
+
+    def _on_invalidate(self, kind: str, key: str):
+        if kind == "gym":
+            self.gyms.pop(key)
+        elif kind == "slot":
+            self.slots.pop(key)
+
+    async def get_gym(self, db: AsyncSession, gym_id: str) -> Optional[GymInfo]:
+        gym = self.gyms.get(gym_id)
+        if gym is None:
+            row = (await db.execute(
+                select(Gym.gym_id, Gym.name, Gym.address, Gym.capacity, Gym.status, Gym.owner_id)
+                .where(Gym.gym_id == gym_id)
+            )).first()
+            if row is None:
+                return None
+            gym = GymInfo(**row._mapping)
+            self.gyms.set(gym_id, gym)
+        return gym
+
+    async def get_slot(self, db: AsyncSession, slot_id: str) -> Optional[SlotInfo]:
+        slot = self.slots.get(slot_id)
+        if slot is None:
+            row = (await db.execute(
+                select(Slot.slot_id, Slot.gym_id, Slot.start_time, Slot.end_time).where(Slot.slot_id == slot_id)
+            )).first()
+            if row is None:
+                return None
+            slot = SlotInfo(**row._mapping)
+            self.slots.set(slot_id, slot)
+        return slot
+
+    def invalidate_gym(self, gym_id: str):
+        self.backend.publish("gym", gym_id)
+
+    def invalidate_slot(self, slot_id: str):
+        self.backend.publish("slot", slot_id)
+
+    def stats(self) -> dict:
+        return {"gyms": self.gyms.stats(), "slots": self.slots.stats()}
+
+
+catalog = CatalogCache(
+    maxsize=int(os.environ.get("CATALOG_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("CATALOG_CACHE_TTL", 60)),
+)
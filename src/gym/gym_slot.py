@@ -1,13 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.models.base import get_db
 from src.models.gym_slot import Slot, Gym
+from src.models.order import Order
 from src.models.vendors import GymOwner
 from datetime import datetime
 from src.vendor.login import get_current_user
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
 from src.utils import generate_id
+from src.utils.schemas import Message
+from src.orders.occupancy import OccupancyDeltas, record_changes
+from .catalog import catalog
 
 gym_router = APIRouter(
     prefix="/gym",
@@ -17,9 +23,9 @@ gym_router = APIRouter(
 )
 
 class Status(str, Enum):
-    Added: 'Added'
-    Paused: 'Paused'
-    Stopped: 'Stopped'
+    Added = 'Added'
+    Paused = 'Paused'
+    Stopped = 'Stopped'
     
 
 class GymDetails(BaseModel):
@@ -27,61 +33,93 @@ class GymDetails(BaseModel):
     address: str
     capacity: int
 
-@gym_router.post("/add_gym/")
-def add_gym(gym: GymDetails, db: Session = Depends(get_db)):
-    existing_gym = db.query(Gym).filter(Gym.name == gym.name).first()
+class GymOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    gym_id: str
+    name: str
+    address: str
+    capacity: int
+    owner_id: Optional[str] = None
+    status: Status
+
+@gym_router.post("/add_gym/", response_model=GymOut)
+async def add_gym(gym: GymDetails, db: AsyncSession = Depends(get_db), current_user: GymOwner = Depends(get_current_user)):
+    existing_gym = await db.scalar(select(Gym.gym_id).where(Gym.name == gym.name))
     if existing_gym:
         raise HTTPException(status_code=400, detail="Gym with this name already exists")
     
-    gym = Gym(**gym.model_dump(), gym_id=generate_id())
+    gym = Gym(**gym.model_dump(), gym_id=generate_id(), owner_id=current_user.owner_id)
     gym.status = "Added"
 
     db.add(gym)
-    db.commit()
-    db.refresh(gym)
+    await db.commit()
     
     return gym
 
-@gym_router.put("/remove_gym/{gym_id}")
-def remove_gym(gym_id: str, db: Session = Depends(get_db), current_user: GymOwner = Depends(get_current_user)):
-    gym = db.query(Gym).get(gym_id)
+async def set_gym_status(db: AsyncSession, gym_id: str, current_user: GymOwner, new_status: str):
+    gym = await catalog.get_gym(db, gym_id)
     if not gym:
         raise HTTPException(status_code=404, detail="Gym not found")
     if gym.owner_id != current_user.owner_id:
-        raise HTTPException(status_code=403, detail="You don't have permission to update this slot")
-    
-    gym.status = "Stopped"
-    db.commit()
-    return {"message": "Gym removed successfully"}
+        raise HTTPException(status_code=403, detail="You don't have permission to update this gym")
 
-@gym_router.put("/pause_gym/{gym_id}")
-def remove_gym(gym_id: str, db: Session = Depends(get_db), current_user: GymOwner = Depends(get_current_user)):
-    gym = db.query(Gym).get(gym_id)
-    if not gym:
-        raise HTTPException(status_code=404, detail="Gym not found")
-    if gym.owner_id != current_user.owner_id:
-        raise HTTPException(status_code=403, detail="You don't have permission to update this slot")
-    
-    gym.status = "Stopped"
-    db.commit()
+    await db.execute(update(Gym).where(Gym.gym_id == gym_id).values(status=new_status))
+    await db.commit()
+    catalog.invalidate_gym(gym_id)
+
+@gym_router.put("/remove_gym/{gym_id}", response_model=Message)
+async def remove_gym(gym_id: str, db: AsyncSession = Depends(get_db), current_user: GymOwner = Depends(get_current_user)):
+    await set_gym_status(db, gym_id, current_user, "Stopped")
     return {"message": "Gym removed successfully"}
 
+@gym_router.put("/pause_gym/{gym_id}", response_model=Message)
+async def pause_gym(gym_id: str, db: AsyncSession = Depends(get_db), current_user: GymOwner = Depends(get_current_user)):
+    await set_gym_status(db, gym_id, current_user, "Paused")
+    return {"message": "Gym paused successfully"}
 
-@gym_router.put("/slots/{slot_id}")
-def update_slot(slot_id: int, new_start_time: datetime, new_end_time: datetime, 
-                db: Session = Depends(get_db), current_user: GymOwner = Depends(get_current_user)):
-    slot = db.query(Slot).get(slot_id)
+
+@gym_router.put("/slots/{slot_id}", response_model=Message)
+async def update_slot(slot_id: str, new_start_time: datetime, new_end_time: datetime, 
+                db: AsyncSession = Depends(get_db), current_user: GymOwner = Depends(get_current_user)):
+    slot = await catalog.get_slot(db, slot_id)
     if not slot:
         raise HTTPException(status_code=404, detail="Slot not found")
     
-    associated_gym = slot.gym
-    if not associated_gym and associated_gym.owner != current_user:
+    associated_gym = await catalog.get_gym(db, slot.gym_id)
+    if not associated_gym or associated_gym.owner_id != current_user.owner_id:
         raise HTTPException(status_code=403, detail="You don't have permission to update this slot")
     
-    # Update the slot details here
-    slot.start_time = new_start_time
-    slot.end_time = new_end_time
-    slot.slot_id = generate_id()
-    db.commit()
+    # The slot keeps its id so its orders and waitlist entries still point at it.
+    # Matching the start time we read makes a stale cached copy miss rather
+    # than move the counters from the wrong day
+    result = await db.execute(
+        update(Slot)
+        .where(Slot.slot_id == slot_id, Slot.start_time == slot.start_time)
+        .values(start_time=new_start_time, end_time=new_end_time)
+    )
+    if result.rowcount != 1:
+        # Another worker moved or removed it first and our cached copy was stale
+        await db.rollback()
+        catalog.invalidate_slot(slot_id)
+        raise HTTPException(status_code=409, detail="Slot was changed by another request, try again")
+
+    # The slot and its orders move from the old day to the new one
+    old_day, new_day = slot.start_time.date(), new_start_time.date()
+    deltas = OccupancyDeltas()
+    if old_day != new_day:
+        deltas.add(slot.gym_id, old_day, "slots", -1)
+        deltas.add(slot.gym_id, new_day, "slots")
+        orders = await db.execute(
+            select(Order.gym_id, Order.status, func.count())
+            .where(Order.slot_id == slot_id)
+            .group_by(Order.gym_id, Order.status)
+        )
+        for gym_id, status, count in orders:
+            deltas.add_order(gym_id, old_day, status, -count)
+            deltas.add_order(gym_id, new_day, status, count)
+    await record_changes(db, deltas)
+    await db.commit()
+    catalog.invalidate_slot(slot_id)
     
     return {"message": "Slot updated successfully"}
@@ -0,0 +1,224 @@
+import logging
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("src.metrics")
+slow_query_logger = logging.getLogger("src.metrics.slow_query")
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+# The same SELECT this many times in one request is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", 2))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    """What the database did on behalf of one request."""
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.selects = Counter()
+        # Set by handlers that re-run a query on purpose, such as long-polls
+        self.repeats_expected = False
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.wall_seconds = 0.0
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.n_plus_one = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.slow_queries = 0
+        # Extra gauges from other subsystems, e.g. pool or cache counters
+        self.collectors: Dict[str, Callable[[], dict]] = {}
+
+    def observe(self, method: str, route: str, status_code: int, wall_seconds: float, stats: RequestStats,
+                n_plus_one: int):
+        metrics = self.routes.setdefault((method, route), RouteMetrics())
+        metrics.requests += 1
+        if status_code >= 500:
+            metrics.errors += 1
+        metrics.wall_seconds += wall_seconds
+        metrics.statements += stats.statements
+        metrics.db_seconds += stats.db_seconds
+        metrics.rows += stats.rows
+        metrics.n_plus_one += n_plus_one
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if wall_seconds <= bound:
+                metrics.buckets[i] += 1
+
+    def register_collector(self, name: str, collect: Callable[[], dict]):
+        self.collectors[name] = collect
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def labels(method: str, route: str) -> str:
+            return f'method="{method}",route="{route}"'
+
+        counters = (
+            ("http_requests_total", "requests", "Requests handled"),
+            ("http_request_errors_total", "errors", "Requests answered with a 5xx status"),
+            ("db_statements_total", "statements", "SQL statements executed"),
+            ("db_seconds_total", "db_seconds", "Time spent executing SQL"),
+            ("db_rows_total", "rows", "Rows returned or affected by SQL"),
+            ("db_n_plus_one_total", "n_plus_one", "Repeated SELECTs flagged as N+1 patterns"),
+        )
+        for name, attr, help_text in counters:
+            family(name, "counter", help_text)
+            for (method, route), metrics in sorted(self.routes.items()):
+                lines.append(f"{name}{{{labels(method, route)}}} {getattr(metrics, attr)}")
+
+        family("http_request_duration_seconds", "histogram", "Wall time per request")
+        for (method, route), metrics in sorted(self.routes.items()):
+            for bound, count in zip(LATENCY_BUCKETS, metrics.buckets):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels(method, route)},le="{bound}"}} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels(method, route)},le="+Inf"}} {metrics.requests}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels(method, route)}}} {metrics.wall_seconds}")
+            lines.append(f"http_request_duration_seconds_count{{{labels(method, route)}}} {metrics.requests}")
+
+        family("db_slow_queries_total", "counter", "Statements slower than SLOW_QUERY_MS")
+        lines.append(f"db_slow_queries_total {self.slow_queries}")
+
+        for prefix, collect in sorted(self.collectors.items()):
+            for key, value in _flatten(collect()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"{prefix}_{key} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _flatten(values: dict, prefix: str = ""):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        else:
+            yield f"{prefix}{key}", value
+
+
+registry = MetricsRegistry()
+
+
+def _parameter_shape(parameters):
+    """Describe bound parameters by type only, so values never reach the log."""
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (list, tuple, dict)):
+        return f"{len(parameters)} x {_parameter_shape(parameters[0])}"
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def instrument_engine(engine: Engine):
+    """Record statement counts, DB time and slow queries for the given (sync) engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+            if cursor.rowcount > 0:
+                stats.rows += cursor.rowcount
+            if statement.lstrip()[:6].upper() == "SELECT":
+                stats.selects[statement] += 1
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            registry.slow_queries += 1
+            slow_query_logger.warning(
+                "slow query %.1fms: %s params=%s", elapsed * 1000, statement, _parameter_shape(parameters)
+            )
+
+
+@event.listens_for(Session, "do_orm_execute")
+def count_returned_rows(orm_execute_state):
+    # SELECT row counts are only known once fetched. Results the caller asked
+    # to buffer in full, as AsyncSession.execute does, are in memory anyway,
+    # so counting them costs a copy of the row list but no extra round trip.
+    # Streamed results are left alone; whoever iterates them reports the
+    # rows with count_rows.
+    stats = _request_stats.get()
+    if stats is None or not orm_execute_state.is_select:
+        return None
+    options = orm_execute_state.execution_options
+    if not options.get("prebuffer_rows") or options.get("stream_results") or options.get("yield_per"):
+        return None
+    frozen = orm_execute_state.invoke_statement().freeze()
+    stats.rows += len(frozen.data)
+    return frozen()
+
+
+def count_rows(rows: int):
+    """Add rows read from a streamed result to the current request's count."""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.rows += rows
+
+
+def expect_repeated_queries():
+    """Exempt the current request from N+1 detection."""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.repeats_expected = True
+
+
+async def record_request_metrics(request: Request, call_next):
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        wall_seconds = time.perf_counter() - start
+        _request_stats.reset(token)
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+
+        repeated = {
+            statement: count for statement, count in stats.selects.items()
+            if count >= N_PLUS_ONE_THRESHOLD and not stats.repeats_expected
+        }
+        for statement, count in repeated.items():
+            logger.warning("possible N+1 on %s %s: %d x %s", request.method, route_path, count, statement)
+
+        registry.observe(request.method, route_path, status_code, wall_seconds, stats, len(repeated))
+
+
+metrics_router = APIRouter(tags=["metrics"])
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4")
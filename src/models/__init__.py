@@ -1,4 +1,9 @@
 from .customer import Customer
-from .order import Order
+from .order import Order, OrderEvent, OrderEventDeadLetter
 from .vendors import GymOwner
-from .gym_slot import Gym, Slot
\ No newline at end of file
+from .gym_slot import Gym, Slot
+from .occupancy import GymOccupancy
+from .ratelimit import RateLimitBucket
+from .waitlist import WaitlistEntry
+from .idempotency import IdempotencyRecord
+from .revocation import Revocation
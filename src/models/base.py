@@ -1,22 +1,37 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+import time
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base
+from .engine import EngineSettings, PoolMetrics, build_engine, pool_status
+from src.metrics.instrumentation import instrument_engine
 
 Base = declarative_base()
 
-DATABASE_URL = "sqlite:///./test.db"  # Use the appropriate URL for your SQLite database file
+# Configured through DATABASE_URL, DB_POOL_* and SQLITE_* environment variables
+settings = EngineSettings.from_env()
+pool_metrics = PoolMetrics()
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = build_engine(settings, pool_metrics)
+# Per-request SQL counts, DB time and the slow query log
+instrument_engine(engine.sync_engine)
+# Objects stay usable after commit; lazy refreshes are not possible on an async session
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
-def create_tables():
+async def create_tables():
     print("creating database")
-    Base.metadata.create_all(bind=engine, checkfirst=True)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, checkfirst=True)
+        # Imported here as migrations needs Base from this module
+        from .migrations import upgrade_schema
+        await conn.run_sync(upgrade_schema)
     print("creating database")
 
-def get_db():
-    db = SessionLocal()
-    try:
+def get_pool_status():
+    return pool_status(engine, pool_metrics)
+
+async def get_db():
+    async with SessionLocal() as db:
+        # Check the connection out up front so time spent waiting on the pool is measured
+        start = time.perf_counter()
+        await db.connection()
+        pool_metrics.record_wait(time.perf_counter() - start)
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,21 +1,22 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, String, DateTime
 from sqlalchemy.orm import relationship
 from .base import Base
+from .types import IdType
 
 class Customer(Base):
     __tablename__ = 'customer'
-    customer_id = Column(String(50), primary_key=True)
+    customer_id = Column(IdType(), primary_key=True)
     first_name = Column(String(50))
     last_name = Column(String(50))
-    email = Column(String(100))
+    email = Column(String(100), unique=True, index=True)
     phone_number = Column(String(20))
     
     orders = relationship("Order", back_populates="customer")
 
 class LoginCredential(Base):
     __tablename__ = 'login_credential'
-    credential_id = Column(String(50), primary_key=True)
-    customer_id = Column(Integer, unique=True)
+    credential_id = Column(IdType(), primary_key=True)
+    customer_id = Column(IdType(), unique=True)
     username = Column(String(50), unique=True)
     password = Column(String(100))
     registration_date = Column(DateTime)
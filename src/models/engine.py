@@ -0,0 +1,140 @@
+import os
+from dataclasses import dataclass
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass
+class EngineSettings:
+    database_url: str = "sqlite+aiosqlite:///./test.db"
+    echo: bool = False
+    # Pool settings, used by server databases and file backed SQLite
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_pre_ping: bool = True
+    pool_recycle: int = 1800
+    # SQLite pragmas applied on every new connection
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+
+    @classmethod
+    def from_env(cls) -> "EngineSettings":
+        defaults = cls()
+        return cls(
+            database_url=os.environ.get("DATABASE_URL", defaults.database_url),
+            echo=_env_bool("DB_ECHO", defaults.echo),
+            pool_size=int(os.environ.get("DB_POOL_SIZE", defaults.pool_size)),
+            max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", defaults.max_overflow)),
+            pool_timeout=float(os.environ.get("DB_POOL_TIMEOUT", defaults.pool_timeout)),
+            pool_pre_ping=_env_bool("DB_POOL_PRE_PING", defaults.pool_pre_ping),
+            pool_recycle=int(os.environ.get("DB_POOL_RECYCLE", defaults.pool_recycle)),
+            sqlite_journal_mode=os.environ.get("SQLITE_JOURNAL_MODE", defaults.sqlite_journal_mode),
+            sqlite_synchronous=os.environ.get("SQLITE_SYNCHRONOUS", defaults.sqlite_synchronous),
+            sqlite_busy_timeout_ms=int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", defaults.sqlite_busy_timeout_ms)),
+            sqlite_mmap_size=int(os.environ.get("SQLITE_MMAP_SIZE", defaults.sqlite_mmap_size)),
+            sqlite_cache_size_kib=int(os.environ.get("SQLITE_CACHE_SIZE_KIB", defaults.sqlite_cache_size_kib)),
+        )
+
+    @property
+    def is_sqlite(self) -> bool:
+        return make_url(self.database_url).get_backend_name() == "sqlite"
+
+    @property
+    def is_memory_sqlite(self) -> bool:
+        return self.is_sqlite and make_url(self.database_url).database in (None, "", ":memory:")
+
+
+class PoolMetrics:
+    """Counters for connection pool usage, used to size workers."""
+
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.checked_out = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.waits += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "checked_out": self.checked_out,
+            "waits": self.waits,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+
+def _apply_sqlite_pragmas(settings: EngineSettings, dbapi_connection):
+    cursor = dbapi_connection.cursor()
+    if not settings.is_memory_sqlite:
+        cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    # Negative cache_size is in KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_size_kib}")
+    cursor.close()
+
+
+def build_engine(settings: EngineSettings, metrics: PoolMetrics) -> AsyncEngine:
+    kwargs = {"echo": settings.echo}
+    if not settings.is_memory_sqlite:
+        kwargs.update(
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_pre_ping=settings.pool_pre_ping,
+            pool_recycle=settings.pool_recycle,
+        )
+    engine = create_async_engine(settings.database_url, **kwargs)
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+        if settings.is_sqlite:
+            _apply_sqlite_pragmas(settings, dbapi_connection)
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+        metrics.checked_out += 1
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        metrics.checkins += 1
+        metrics.checked_out -= 1
+
+    return engine
+
+
+def pool_status(engine: AsyncEngine, metrics: PoolMetrics) -> dict:
+    pool = engine.sync_engine.pool
+    status = metrics.snapshot()
+    for name in ("size", "checkedin", "overflow"):
+        # Not every pool class (e.g. StaticPool) implements these
+        if hasattr(pool, name):
+            status[f"pool_{name}"] = getattr(pool, name)()
+    return status
+
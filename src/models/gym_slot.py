@@ -1,15 +1,16 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, CheckConstraint
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 from .base import Base
+from .types import IdType
 
 
 class Gym(Base):
     __tablename__ = 'gym'
-    gym_id = Column(String(50), primary_key=True)
-    name = Column(String(100))
+    gym_id = Column(IdType(), primary_key=True)
+    name = Column(String(100), unique=True, index=True)
     address = Column(String(200))
     capacity = Column(Integer)
-    owner_id = Column(String(50), ForeignKey('gym_owner.owner_id'))
+    owner_id = Column(IdType(), ForeignKey('gym_owner.owner_id'), index=True)
     status = Column(String(20), CheckConstraint("status IN ('Added', 'Paused', 'Stopped')"))
     
     owner = relationship("GymOwner", back_populates="gyms")
@@ -18,8 +19,14 @@ class Gym(Base):
 
 class Slot(Base):
     __tablename__ = 'slot'
-    slot_id = Column(String(50), primary_key=True)
-    gym_id = Column(String(50), ForeignKey('gym.gym_id'))
+    __table_args__ = (
+        # Also serves lookups on gym_id alone
+        Index('ix_slot_gym_id_start_time', 'gym_id', 'start_time'),
+        # Keyset pagination order for slot search across gyms
+        Index('ix_slot_start_time_slot_id', 'start_time', 'slot_id'),
+    )
+    slot_id = Column(IdType(), primary_key=True)
+    gym_id = Column(IdType(), ForeignKey('gym.gym_id'))
     start_time = Column(DateTime)
     end_time = Column(DateTime)
     available_capacity = Column(Integer)
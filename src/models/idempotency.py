@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, Integer, String, Text
+from .base import Base
+
+
+class IdempotencyRecord(Base):
+    """The stored outcome of a request sent with an Idempotency-Key, replayed to its retries."""
+    __tablename__ = 'idempotency_record'
+    # Scoped to the principal, so two customers cannot collide on a key
+    key = Column(String(300), primary_key=True)
+    # Hash of the request, to refuse a key reused for a different request
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=False)
+    body = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
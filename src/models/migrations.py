@@ -0,0 +1,102 @@
+from sqlalchemy import Integer, MetaData, String, Table, func, inspect, select
+from sqlalchemy.engine import Connection
+from .base import Base
+
+# Columns whose type changed after release, as (table, column); their model holds the new type
+RETYPED_COLUMNS = [
+    # Was Integer, while Customer.customer_id is a string
+    ("login_credential", "customer_id"),
+]
+
+
+class MigrationError(RuntimeError):
+    """The database cannot be upgraded automatically; the message says what to fix."""
+
+
+def upgrade_schema(conn: Connection):
+    """Bring tables created by earlier releases up to the current models."""
+    retype_columns(conn)
+    return create_missing_indexes(conn)
+
+
+def retype_columns(conn: Connection):
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table_name, column_name in RETYPED_COLUMNS:
+        if table_name not in existing_tables:
+            continue
+        current = {column["name"]: column["type"] for column in inspector.get_columns(table_name)}[column_name]
+        if not isinstance(current, Integer):
+            continue
+        table = Base.metadata.tables[table_name]
+        if not isinstance(table.c[column_name].type, String):
+            raise MigrationError(
+                f"{table_name}.{column_name} is still an integer column; converting it to binary key "
+                "storage is not supported, start from ID_STORAGE=string"
+            )
+        if conn.dialect.name == "sqlite":
+            _rebuild_sqlite_table(conn, table, column_name)
+        else:
+            target = table.c[column_name].type.compile(dialect=conn.dialect)
+            conn.exec_driver_sql(
+                f'ALTER TABLE "{table_name}" ALTER COLUMN "{column_name}" TYPE {target} USING "{column_name}"::text'
+            )
+
+
+def _rebuild_sqlite_table(conn: Connection, table: Table, column_name: str):
+    # SQLite cannot change a column's type in place. Copy the rows into a table
+    # built from the model, then swap it in; renaming the new table rather than
+    # the old one keeps other tables' foreign keys pointing at the right name.
+    new_table = table.to_metadata(MetaData(), name=f"_{table.name}_upgraded")
+    for index in inspect(conn).get_indexes(table.name):
+        conn.exec_driver_sql(f'DROP INDEX "{index["name"]}"')
+    new_table.create(conn)
+    columns = ", ".join(f'"{column.name}"' for column in table.columns)
+    values = ", ".join(
+        f'CAST("{column.name}" AS TEXT)' if column.name == column_name else f'"{column.name}"'
+        for column in table.columns
+    )
+    conn.exec_driver_sql(f'INSERT INTO "{new_table.name}" ({columns}) SELECT {values} FROM "{table.name}"')
+    conn.exec_driver_sql(f'DROP TABLE "{table.name}"')
+    conn.exec_driver_sql(f'ALTER TABLE "{new_table.name}" RENAME TO "{table.name}"')
+
+
+def _check_unique(conn: Connection, table: Table, index):
+    """Refuse to add a unique index the existing rows would violate, naming the offending values."""
+    columns = list(index.columns)
+    duplicates = conn.execute(
+        select(*columns, func.count())
+        .where(*(column.isnot(None) for column in columns))
+        .group_by(*columns)
+        .having(func.count() > 1)
+        .limit(5)
+    ).all()
+    if duplicates:
+        examples = ", ".join(f"{tuple(row[:-1])} x{row[-1]}" for row in duplicates)
+        raise MigrationError(
+            f"Cannot add unique index {index.name}: {table.name} has duplicate "
+            f"{', '.join(column.name for column in columns)} values, e.g. {examples}. "
+            "Remove or rename the duplicates and start again."
+        )
+
+
+def create_missing_indexes(conn: Connection):
+    """Add indexes declared on the models to tables created before they existed.
+
+    create_all only emits CREATE INDEX for tables it creates itself, so
+    databases from earlier releases need this pass on startup.
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                if index.unique:
+                    _check_unique(conn, table, index)
+                index.create(conn)
+                created.append(index.name)
+    return created
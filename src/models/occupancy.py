@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer
+from .base import Base
+from .types import IdType
+
+
+class GymOccupancy(Base):
+    """Per gym, per day booking counters, kept up to date as orders change state.
+
+    A day is the start date of the booked slot. Maintained by src.orders.occupancy.
+    """
+    __tablename__ = 'gym_occupancy'
+    gym_id = Column(IdType(), ForeignKey('gym.gym_id'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    slots = Column(Integer, nullable=False, default=0)
+    bookings = Column(Integer, nullable=False, default=0)
+    cancellations = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
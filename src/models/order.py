@@ -1,18 +1,49 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, CheckConstraint
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, Text, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 from .base import Base
+from .types import IdType
 
 
 
 class Order(Base):
     __tablename__ = 'order'
-    order_id = Column(String(50), primary_key=True)
-    customer_id = Column(String(50), ForeignKey('customer.customer_id'))
-    gym_id = Column(String(50), ForeignKey('gym.gym_id'))
-    slot_id = Column(String(50), ForeignKey('slot.slot_id'))
+    __table_args__ = (
+        # Also serves lookups on customer_id alone
+        Index('ix_order_customer_id_order_time', 'customer_id', 'order_time'),
+    )
+    order_id = Column(IdType(), primary_key=True)
+    customer_id = Column(IdType(), ForeignKey('customer.customer_id'))
+    gym_id = Column(IdType(), ForeignKey('gym.gym_id'), index=True)
+    slot_id = Column(IdType(), ForeignKey('slot.slot_id'), index=True)
     order_time = Column(DateTime)
     status = Column(String(20), CheckConstraint("status IN ('Created','Pending','Processing','Confirmed','Failed','Cancelled')"))
 
     customer = relationship("Customer", back_populates="orders")
     gym = relationship("Gym", back_populates="orders")
     slot = relationship("Slot", back_populates="orders")
+
+
+class OrderEvent(Base):
+    """Outbox of requested order status transitions, applied in batches by the event consumer."""
+    __tablename__ = 'order_event'
+    event_id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(IdType(), ForeignKey('order.order_id'), nullable=False)
+    to_status = Column(String(20), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    # Set when a consumer claims the event; NULL means still pending
+    processed_at = Column(DateTime, index=True)
+    outcome = Column(String(20), CheckConstraint("outcome IN ('Applied','Rejected')"))
+
+
+class OrderEventDeadLetter(Base):
+    """Events the consumer gave up on after they kept failing on their own.
+
+    The event itself is marked Rejected; this keeps what it asked for and why
+    it failed, and outlives the purge of processed events so it can be replayed.
+    """
+    __tablename__ = 'order_event_dead_letter'
+    event_id = Column(Integer, primary_key=True)
+    order_id = Column(IdType(), nullable=False)
+    to_status = Column(String(20), nullable=False)
+    error = Column(Text, nullable=False)
+    failed_at = Column(DateTime, nullable=False)
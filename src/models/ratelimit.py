@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Float, String
+from .base import Base
+
+
+class RateLimitBucket(Base):
+    """Token buckets of the shared rate limit backend; updated_at is a Unix timestamp."""
+    __tablename__ = 'rate_limit_bucket'
+    key = Column(String(200), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Float, Integer, String
+from .base import Base
+
+
+class Revocation(Base):
+    """Revoked tokens, shared by every worker; times are Unix timestamps.
+
+    A row with a jti revokes that one token. Without one it revokes every token
+    issued to (role, subject) up to revoked_at.
+    """
+    __tablename__ = 'revocation'
+    revocation_id = Column(Integer, primary_key=True, autoincrement=True)
+    jti = Column(String(50))
+    role = Column(String(20), nullable=False)
+    subject = Column(String(100), nullable=False)
+    # Workers re-read the rows revoked since shortly before their last sync
+    revoked_at = Column(Float, nullable=False, index=True)
+    # No token the row covers is valid after this, so the row can go
+    expires_at = Column(Float, nullable=False, index=True)
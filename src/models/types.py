@@ -0,0 +1,53 @@
+import os
+import uuid
+from sqlalchemy import LargeBinary, String
+from sqlalchemy.types import TypeDecorator
+from src.utils import ids
+
+# How generated keys are stored: "string" (the default) or "binary". Chosen
+# when tables are created; switching an existing database needs a migration.
+ID_STORAGE = os.environ.get("ID_STORAGE", "string")
+
+
+class BinaryId(TypeDecorator):
+    """UUID keys stored as their 16 bytes rather than 36 characters, for smaller keys and indexes.
+
+    Anything that is not a UUID is stored as its UTF-8 text instead, so seeded
+    ids still round-trip and a malformed id in a lookup simply matches nothing.
+    Text that is 16 bytes long gets a NUL appended, so it cannot be read back
+    as a UUID.
+    """
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        try:
+            key = uuid.UUID(value)
+        except ValueError:
+            key = None
+        # Only the canonical form, so every value reads back exactly as written
+        if key is not None and str(key) == value:
+            return key.bytes
+        text = value.encode()
+        return text + b"\0" if len(text) == 16 else text
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if len(value) == 16:
+            return str(uuid.UUID(bytes=value))
+        text = value.decode()
+        return text[:-1] if len(value) == 17 and text.endswith("\0") else text
+
+
+def IdType():
+    """Column type for keys made by src.utils.generate_id."""
+    if ID_STORAGE == "binary":
+        if not ids.generator.uuids:
+            raise RuntimeError("ID_STORAGE=binary needs a UUID ID_GENERATOR")
+        return BinaryId()
+    if ID_STORAGE != "string":
+        raise ValueError(f"Unknown ID_STORAGE {ID_STORAGE!r}, expected string or binary")
+    return String(50)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, CheckConstraint, Index
+from .base import Base
+from .types import IdType
+
+
+class WaitlistEntry(Base):
+    """A customer queued for a full slot; entries are promoted to orders in entry_id order."""
+    __tablename__ = 'waitlist_entry'
+    __table_args__ = (
+        # Head of a slot's queue, and a customer's place in it
+        Index('ix_waitlist_entry_slot_id_status_entry_id', 'slot_id', 'status', 'entry_id'),
+    )
+    entry_id = Column(Integer, primary_key=True, autoincrement=True)
+    slot_id = Column(IdType(), ForeignKey('slot.slot_id'), nullable=False)
+    gym_id = Column(IdType(), ForeignKey('gym.gym_id'), nullable=False)
+    customer_id = Column(IdType(), ForeignKey('customer.customer_id'), nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False)
+    status = Column(String(20), CheckConstraint("status IN ('Waiting','Promoted','Left')"), nullable=False)
+    # The order created when the entry reached a free seat
+    order_id = Column(IdType(), ForeignKey('order.order_id'))
+    promoted_at = Column(DateTime)
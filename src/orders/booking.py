@@ -0,0 +1,80 @@
+import asyncio
+from datetime import datetime
+from typing import Callable, Optional
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models.order import Order
+from src.models.gym_slot import Slot
+from src.utils import generate_id
+from .occupancy import OccupancyDeltas, record_changes
+
+MAX_BOOKING_ATTEMPTS = 5
+BOOKING_RETRY_BACKOFF = 0.01  # seconds, doubled on every retry
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+class BookingContention(Exception):
+    pass
+
+
+async def reserve_slot(db: AsyncSession, slot_id: str, gym_id: str) -> Optional[datetime]:
+    # Decrement capacity only if there is some left; a returned start time means we got a seat
+    return await db.scalar(
+        update(Slot)
+        .where(Slot.slot_id == slot_id, Slot.gym_id == gym_id, Slot.available_capacity > 0)
+        .values(available_capacity=Slot.available_capacity - 1)
+        .returning(Slot.start_time)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def place_order(db: AsyncSession, customer_id: str, gym_id: str, slot_id: str, start_time: datetime) -> Order:
+    """Add the order for a seat that is already reserved, and count it; the caller commits."""
+    order = Order(
+        order_id=generate_id(),
+        customer_id=customer_id,
+        gym_id=gym_id,
+        slot_id=slot_id,
+        order_time=datetime.now(),
+        status="Created",
+    )
+    db.add(order)
+    deltas = OccupancyDeltas()
+    deltas.add_order(gym_id, start_time.date(), order.status)
+    await record_changes(db, deltas)
+    return order
+
+
+async def book_slot(db: AsyncSession, customer_id: str, gym_id: str, slot_id: str,
+                    on_booked: Optional[Callable[[Order], None]] = None) -> Order:
+    """Reserve a seat and insert the order in a single transaction, retrying on lock contention.
+
+    on_booked is called with the new order before the commit, to add rows that
+    must commit with it.
+    """
+    backoff = BOOKING_RETRY_BACKOFF
+    for attempt in range(MAX_BOOKING_ATTEMPTS):
+        try:
+            start_time = await reserve_slot(db, slot_id, gym_id)
+            if start_time is None:
+                await db.rollback()
+                raise SlotUnavailable(slot_id)
+
+            order = await place_order(db, customer_id, gym_id, slot_id, start_time)
+            if on_booked:
+                on_booked(order)
+            await db.commit()
+            return order
+        except OperationalError:
+            # SQLite reports "database is locked" when another writer holds the file
+            await db.rollback()
+            if attempt == MAX_BOOKING_ATTEMPTS - 1:
+                break
+            await asyncio.sleep(backoff)
+            backoff *= 2
+
+    raise BookingContention(slot_id)
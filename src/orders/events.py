@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, insert, literal, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from src.models.order import Order, OrderEvent, OrderEventDeadLetter
+from src.models.gym_slot import Slot
+from src.models.base import SessionLocal
+from .occupancy import ENDING_COUNTERS, OccupancyDeltas, record_changes
+from .waitlist import notifier, promote
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENT_BATCH_SIZE = int(os.environ.get("ORDER_EVENT_BATCH_SIZE", 500))
+# How often a consumer looks for events queued by other worker processes
+ORDER_EVENT_POLL_INTERVAL = float(os.environ.get("ORDER_EVENT_POLL_INTERVAL", 0.5))
+ORDER_EVENT_RETENTION = timedelta(hours=float(os.environ.get("ORDER_EVENT_RETENTION_HOURS", 24)))
+# Failures of a batch before its events are retried one at a time, and of a
+# single event before it is dead-lettered
+ORDER_EVENT_MAX_ATTEMPTS = int(os.environ.get("ORDER_EVENT_MAX_ATTEMPTS", 3))
+# Longest wait between retries; the wait doubles from poll_interval with each failure
+ORDER_EVENT_MAX_BACKOFF = float(os.environ.get("ORDER_EVENT_MAX_BACKOFF", 30))
+
+# Allowed transitions of the order state machine
+TRANSITIONS = {
+    "Created": {"Pending", "Processing", "Confirmed", "Failed", "Cancelled"},
+    "Pending": {"Processing", "Confirmed", "Failed", "Cancelled"},
+    "Processing": {"Confirmed", "Failed", "Cancelled"},
+    "Confirmed": {"Cancelled"},
+    "Failed": set(),
+    "Cancelled": set(),
+}
+# Orders in these states hold a seat; moving to a releasing state gives it back
+HOLDING_STATUSES = {"Created", "Pending", "Processing", "Confirmed"}
+RELEASING_STATUSES = {"Failed", "Cancelled"}
+
+
+async def enqueue_transition(db: AsyncSession, order_id: str, to_status: str) -> bool:
+    """Queue a status change for order_id; returns False if the order does not exist."""
+    # INSERT ... SELECT checks the order exists in the same statement, so the
+    # request only ever takes the write lock once and never upgrades a read
+    result = await db.execute(
+        insert(OrderEvent).from_select(
+            ["order_id", "to_status", "created_at"],
+            select(Order.order_id, literal(to_status), literal(datetime.now())).where(Order.order_id == order_id),
+        )
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+class OrderEventConsumer:
+    """Applies queued order transitions in batched transactions.
+
+    Claiming and applying a batch happen in one transaction, so a crash
+    leaves the events pending and they are replayed on the next start. A
+    batch that keeps failing is retried with backoff, then event by event,
+    and an event that still fails alone is dead-lettered so the ones behind
+    it can proceed. Errors from an unavailable or locked database only back
+    off, since every event would fail the same way.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, batch_size: int = ORDER_EVENT_BATCH_SIZE,
+                 poll_interval: float = ORDER_EVENT_POLL_INTERVAL, max_attempts: int = ORDER_EVENT_MAX_ATTEMPTS,
+                 max_backoff: float = ORDER_EVENT_MAX_BACKOFF):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.applied = 0
+        self.rejected = 0
+        self.promoted = 0
+        self.failures = 0
+        self.dead_lettered = 0
+
+    def notify(self):
+        self._wakeup.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        purged_at = datetime.now()
+        # Consecutive errors of any kind set the backoff; only those that are
+        # not transient count towards giving up on the events
+        errors = failures = 0
+        # Events left to process one at a time, after a batch kept failing
+        isolating = 0
+        while True:
+            try:
+                processed = await self.process_batch(limit=1 if isolating else None)
+            except Exception as error:
+                errors += 1
+                self.failures += 1
+                if not isinstance(error, OperationalError):
+                    failures += 1
+                logger.exception("failed to process order events (attempt %d of %d)", failures, self.max_attempts)
+                if failures >= self.max_attempts:
+                    failures = 0
+                    if isolating:
+                        await self._dead_letter_next(error)
+                        isolating -= 1
+                    else:
+                        isolating = self.batch_size
+                await asyncio.sleep(min(self.max_backoff, self.poll_interval * 2 ** errors))
+                continue
+            errors = failures = 0
+            isolating = max(0, isolating - processed) if processed else 0
+
+            if datetime.now() - purged_at > ORDER_EVENT_RETENTION / 24:
+                try:
+                    await self.purge()
+                except Exception:
+                    logger.exception("failed to purge order events")
+                purged_at = datetime.now()
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def _dead_letter_next(self, error: Exception):
+        try:
+            event = await self.dead_letter_next(error)
+        except Exception:
+            logger.exception("failed to dead-letter an order event")
+            return
+        if event is not None:
+            logger.error("dead-lettered order event %s (%s -> %s) after %d failures: %r",
+                         event.event_id, event.order_id, event.to_status, self.max_attempts, error)
+
+    async def dead_letter_next(self, error: Exception):
+        """Set the oldest pending event aside as Rejected, recording why; returns it, or None if none is pending."""
+        async with self.session_factory() as db:
+            now = datetime.now()
+            oldest = (
+                select(OrderEvent.event_id)
+                .where(OrderEvent.processed_at.is_(None))
+                .order_by(OrderEvent.event_id)
+                .limit(1)
+            )
+            # Claimed the same way as a batch, so no other consumer can be applying it meanwhile
+            event = (await db.execute(
+                update(OrderEvent)
+                .where(OrderEvent.event_id.in_(oldest), OrderEvent.processed_at.is_(None))
+                .values(processed_at=now, outcome="Rejected")
+                .returning(OrderEvent.event_id, OrderEvent.order_id, OrderEvent.to_status)
+                .execution_options(synchronize_session=False)
+            )).first()
+            if event is None:
+                await db.rollback()
+                return None
+            db.add(OrderEventDeadLetter(event_id=event.event_id, order_id=event.order_id, to_status=event.to_status,
+                                        error=repr(error), failed_at=now))
+            await db.commit()
+        self.dead_lettered += 1
+        return event
+
+    async def process_batch(self, limit: Optional[int] = None) -> int:
+        async with self.session_factory() as db:
+            # Claim with a write first: the transaction holds the write lock from
+            # the start, and concurrent consumers can never claim the same events
+            pending = (
+                select(OrderEvent.event_id)
+                .where(OrderEvent.processed_at.is_(None))
+                .order_by(OrderEvent.event_id)
+                .limit(limit or self.batch_size)
+            )
+            claimed = (await db.execute(
+                update(OrderEvent)
+                .where(OrderEvent.event_id.in_(pending), OrderEvent.processed_at.is_(None))
+                .values(processed_at=datetime.now())
+                .returning(OrderEvent.event_id, OrderEvent.order_id, OrderEvent.to_status)
+                .execution_options(synchronize_session=False)
+            )).all()
+            if not claimed:
+                await db.rollback()
+                return 0
+            claimed.sort(key=lambda event: event.event_id)
+
+            order_ids = {event.order_id for event in claimed}
+            orders = {
+                order.order_id: order
+                for order in (await db.scalars(select(Order).where(Order.order_id.in_(order_ids)))).all()
+            }
+
+            applied, rejected = [], []
+            released = Counter()
+            ended = Counter()
+            for event in claimed:
+                order = orders.get(event.order_id)
+                if order is None or event.to_status not in TRANSITIONS.get(order.status, ()):
+                    rejected.append(event.event_id)
+                    continue
+                if order.status in HOLDING_STATUSES and event.to_status in RELEASING_STATUSES:
+                    released[order.slot_id] += 1
+                    ended[(order.slot_id, order.gym_id, event.to_status)] += 1
+                order.status = event.to_status
+                applied.append(event.event_id)
+
+            # One capacity update per slot, however many orders in the batch released it
+            slot_days = {}
+            promoted = []
+            for slot_id, seats in released.items():
+                start_time = await db.scalar(
+                    update(Slot)
+                    .where(Slot.slot_id == slot_id)
+                    .values(available_capacity=Slot.available_capacity + seats)
+                    .returning(Slot.start_time)
+                    .execution_options(synchronize_session=False)
+                )
+                slot_days[slot_id] = start_time
+                if start_time is None:
+                    continue
+                # Released seats go to the head of the slot's waitlist first, in this same transaction
+                entries = await promote(db, slot_id, seats, start_time)
+                if entries:
+                    await db.execute(
+                        update(Slot)
+                        .where(Slot.slot_id == slot_id)
+                        .values(available_capacity=Slot.available_capacity - len(entries))
+                        .execution_options(synchronize_session=False)
+                    )
+                    promoted += entries
+            # Bookings on slots that no longer exist have no day to count against
+            deltas = OccupancyDeltas()
+            for (slot_id, gym_id, status), count in ended.items():
+                if slot_days[slot_id] is not None:
+                    deltas.add(gym_id, slot_days[slot_id].date(), ENDING_COUNTERS[status], count)
+            await record_changes(db, deltas)
+            for outcome, event_ids in (("Applied", applied), ("Rejected", rejected)):
+                if event_ids:
+                    await db.execute(
+                        update(OrderEvent)
+                        .where(OrderEvent.event_id.in_(event_ids))
+                        .values(outcome=outcome)
+                        .execution_options(synchronize_session=False)
+                    )
+            await db.commit()
+
+        notifier.notify(entry.entry_id for entry in promoted)
+        self.batches += 1
+        self.applied += len(applied)
+        self.rejected += len(rejected)
+        self.promoted += len(promoted)
+        return len(claimed)
+
+    async def purge(self):
+        async with self.session_factory() as db:
+            await db.execute(
+                delete(OrderEvent).where(OrderEvent.processed_at < datetime.now() - ORDER_EVENT_RETENTION)
+            )
+            await db.commit()
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "applied": self.applied, "rejected": self.rejected, "promoted": self.promoted,
+                "failures": self.failures, "dead_lettered": self.dead_lettered}
+
+
+consumer = OrderEventConsumer(SessionLocal)
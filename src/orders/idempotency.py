@@ -0,0 +1,184 @@
+"""Idempotency-Key support, so a client can retry a request without repeating its effect.
+
+The first request with a key runs; its response is kept in IdempotencyRecord
+and in an in-memory LRU in front of it, and later requests with the same key
+get that response back without running again. Within a worker, duplicates
+that arrive while the first is still running wait for its result. A record
+for a booking is written in the booking's own transaction, so when duplicates
+run on two workers at once only one can commit and the other replays it.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from src.models.base import SessionLocal
+from src.models.idempotency import IdempotencyRecord
+from src.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL = timedelta(hours=float(os.environ.get("IDEMPOTENCY_TTL_HOURS", 24)))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get("IDEMPOTENCY_CACHE_SIZE", 10000))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    body: str
+
+
+def fingerprint(*parts: str) -> str:
+    """Hash of what makes two requests the same request."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """Responses by idempotency key, with the in-flight requests of this worker."""
+
+    def __init__(self, session_factory: async_sessionmaker, ttl: timedelta = IDEMPOTENCY_TTL,
+                 cache_size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.cache = TTLCache(maxsize=cache_size, ttl=ttl.total_seconds())
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.executed = 0
+        self.waited = 0
+        self.stored_hits = 0
+        self.purged = 0
+
+    def record(self, key: str, response: StoredResponse) -> IdempotencyRecord:
+        """The row to add in the same transaction as the work it describes."""
+        return IdempotencyRecord(key=key, fingerprint=response.fingerprint, status_code=response.status_code,
+                                 body=response.body, created_at=datetime.now())
+
+    def remember(self, key: str, response: StoredResponse):
+        """Keep a committed response in memory."""
+        self.cache.set(key, response)
+
+    async def save(self, db: AsyncSession, key: str, response: StoredResponse):
+        """Store a response that was not written with its own transaction."""
+        row = self.record(key, response)
+        stmt = INSERTS[db.get_bind().dialect.name](IdempotencyRecord).values(
+            key=row.key, fingerprint=row.fingerprint, status_code=row.status_code, body=row.body,
+            created_at=row.created_at,
+        ).on_conflict_do_nothing(index_elements=["key"])
+        await db.execute(stmt)
+        await db.commit()
+        self.remember(key, response)
+
+    async def lookup(self, db: AsyncSession, key: str) -> Optional[StoredResponse]:
+        """The stored response for key, or None when there is none or it has expired."""
+        response = self.cache.get(key)
+        if response is not None:
+            return response
+        row = (await db.execute(
+            select(IdempotencyRecord.fingerprint, IdempotencyRecord.status_code, IdempotencyRecord.body,
+                   IdempotencyRecord.created_at)
+            .where(IdempotencyRecord.key == key)
+        )).first()
+        if row is None:
+            return None
+        cutoff = datetime.now() - self.ttl
+        if row.created_at <= cutoff:
+            # Expired but not purged yet; free the key now, or reusing it would
+            # collide with this row when the new response is stored
+            await db.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.key == key, IdempotencyRecord.created_at <= cutoff)
+            )
+            await db.commit()
+            return None
+        self.stored_hits += 1
+        response = StoredResponse(row.fingerprint, row.status_code, row.body)
+        self.remember(key, response)
+        return response
+
+    async def run(self, key: str, execute: Callable[[], Awaitable[StoredResponse]]) -> StoredResponse:
+        """Run execute for the first caller with key; callers arriving meanwhile get its outcome.
+
+        An error is shared too, since the duplicates are the same request.
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.waited += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The first caller went away before finishing; take over
+                return await self.run(key, execute)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            response = await execute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved here, so a key nobody else waited on logs no warning
+            future.exception()
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            del self._in_flight[key]
+            self.executed += 1
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.purge()
+            except Exception:
+                logger.exception("failed to purge idempotency records")
+            await asyncio.sleep(self.ttl.total_seconds() / 24)
+
+    async def purge(self):
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.created_at < datetime.now() - self.ttl)
+            )
+            await db.commit()
+        self.purged += result.rowcount
+
+    def stats(self) -> dict:
+        return {
+            "executed": self.executed,
+            "waited": self.waited,
+            "cache_hits": self.cache.hits,
+            "stored_hits": self.stored_hits,
+            "in_flight": len(self._in_flight),
+            "purged": self.purged,
+        }
+
+
+store = IdempotencyStore(SessionLocal)
@@ -0,0 +1,144 @@
+"""Per gym, per day occupancy counters, maintained incrementally.
+
+Every write path that adds slots, creates or ends a booking, or moves a slot
+records its counter deltas in the same transaction as the change itself, so
+the counters commit or roll back with it. rebuild() recomputes them from the
+slot and order tables and check() compares the two:
+
+    python -m src.orders.occupancy check
+    python -m src.orders.occupancy rebuild
+"""
+import asyncio
+import sys
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models.gym_slot import Slot
+from src.models.occupancy import GymOccupancy
+from src.models.order import Order
+
+COUNTERS = ("slots", "bookings", "cancellations", "failures")
+# Statuses that end a booking, and the counter each one bumps
+ENDING_COUNTERS = {"Cancelled": "cancellations", "Failed": "failures"}
+
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE
+UPSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class OccupancyDeltas:
+    """Counter changes collected during one transaction, keyed by (gym_id, day)."""
+
+    def __init__(self):
+        self.changes: Dict[Tuple[str, date], Counter] = defaultdict(Counter)
+
+    def add(self, gym_id: str, day: date, counter: str, amount: int = 1):
+        self.changes[(gym_id, day)][counter] += amount
+
+    def add_order(self, gym_id: str, day: date, status: str, amount: int = 1):
+        self.add(gym_id, day, "bookings", amount)
+        if status in ENDING_COUNTERS:
+            self.add(gym_id, day, ENDING_COUNTERS[status], amount)
+
+    def rows(self) -> List[dict]:
+        return [
+            {"gym_id": gym_id, "day": day, **{counter: counts[counter] for counter in COUNTERS}}
+            for (gym_id, day), counts in self.changes.items()
+            if any(counts.values())
+        ]
+
+
+async def record_changes(db: AsyncSession, deltas: OccupancyDeltas):
+    """Add deltas to the summary rows; the caller commits."""
+    rows = deltas.rows()
+    if not rows:
+        return
+    stmt = UPSERTS[db.get_bind().dialect.name](GymOccupancy)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["gym_id", "day"],
+        set_={counter: getattr(GymOccupancy, counter) + getattr(stmt.excluded, counter) for counter in COUNTERS},
+    )
+    await db.execute(stmt, rows)
+
+
+def _as_date(value) -> date:
+    # date() of a timestamp comes back as text from SQLite
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+async def recompute(db: AsyncSession) -> OccupancyDeltas:
+    """Count everything from scratch, with the same rules the incremental path follows."""
+    totals = OccupancyDeltas()
+    slot_day = func.date(Slot.start_time)
+    slots = await db.execute(select(Slot.gym_id, slot_day, func.count()).group_by(Slot.gym_id, slot_day))
+    for gym_id, day, count in slots:
+        totals.add(gym_id, _as_date(day), "slots", count)
+    # Orders whose slot no longer exists have no day and are not counted
+    orders = await db.execute(
+        select(Order.gym_id, slot_day, Order.status, func.count())
+        .join(Slot, Slot.slot_id == Order.slot_id)
+        .group_by(Order.gym_id, slot_day, Order.status)
+    )
+    for gym_id, day, status, count in orders:
+        totals.add_order(gym_id, _as_date(day), status, count)
+    return totals
+
+
+async def rebuild(db: AsyncSession) -> int:
+    """Replace every summary row with a full recompute; returns the number of rows written."""
+    rows = (await recompute(db)).rows()
+    await db.execute(delete(GymOccupancy))
+    if rows:
+        await db.execute(insert(GymOccupancy), rows)
+    await db.commit()
+    return len(rows)
+
+
+async def check(db: AsyncSession) -> List[dict]:
+    """Compare the incremental counters against a full recompute and list every difference.
+
+    The two sides are read by separate statements, so run it while bookings are quiet.
+    """
+    stored = OccupancyDeltas()
+    for row in await db.scalars(select(GymOccupancy)):
+        for counter in COUNTERS:
+            stored.add(row.gym_id, row.day, counter, getattr(row, counter))
+    expected = await recompute(db)
+
+    mismatches = []
+    for key in sorted(set(stored.changes) | set(expected.changes)):
+        for counter in COUNTERS:
+            have, want = stored.changes[key][counter], expected.changes[key][counter]
+            if have != want:
+                gym_id, day = key
+                mismatches.append(
+                    {"gym_id": gym_id, "day": day.isoformat(), "counter": counter, "stored": have, "expected": want}
+                )
+    return mismatches
+
+
+async def main(command: str) -> int:
+    from src.models.base import SessionLocal, create_tables
+
+    await create_tables()
+    async with SessionLocal() as db:
+        if command == "rebuild":
+            print(f"rebuilt {await rebuild(db)} occupancy rows")
+            return 0
+        mismatches = await check(db)
+    for mismatch in mismatches:
+        print(mismatch)
+    print(f"{len(mismatches)} mismatched counters")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("check", "rebuild"):
+        sys.exit("usage: python -m src.orders.occupancy check|rebuild")
+    sys.exit(asyncio.run(main(sys.argv[1])))
@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+from typing import Callable, Optional, Tuple, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.models.base import get_db
-from src.models.order import Order
 from src.models.customer import Customer
-from src.models.gym_slot import Gym, Slot
+from src.models.order import Order
 from datetime import datetime
 from src.customer.login import get_current_user
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from enum import Enum
-from src.utils import generate_id
+from src.gym.catalog import catalog
+from .events import enqueue_transition, consumer
+from .booking import book_slot, SlotUnavailable, BookingContention
+from src.ratelimit.limiter import limit
+from src.utils.schemas import Message
+from src.models.base import SessionLocal
+from src.metrics.instrumentation import expect_repeated_queries
+from . import idempotency, waitlist
+from .idempotency import StoredResponse
 
 order_router = APIRouter(
     prefix="/order",
@@ -18,14 +30,20 @@ order_router = APIRouter(
 )
 
 class Status(str, Enum):
-    Created: 'Created'
-    Pending: 'Pending'
-    Processing: 'Processing'
-    Confirmed: 'Confirmed'
-    Failed: 'Failed'
-    Cancelled: 'Cancelled' 
+    Created = 'Created'
+    Pending = 'Pending'
+    Processing = 'Processing'
+    Confirmed = 'Confirmed'
+    Failed = 'Failed'
+    Cancelled = 'Cancelled' 
+
+async def customer_principal(current_user: Customer = Depends(get_current_user)):
+    return current_user.customer_id
 
 class OrderDetails(BaseModel):
+    # Also the response body, read straight off the Order row
+    model_config = ConfigDict(from_attributes=True)
+
     order_id: str
     customer_id: str
     gym_id: str
@@ -33,80 +51,160 @@ class OrderDetails(BaseModel):
     order_time: datetime
     status: Status
 
-@order_router.post("/create_order/")
-def create_order(order: OrderDetails, db: Session = Depends(get_db)):
+class WaitlistStatus(BaseModel):
+    entry_id: int
+    slot_id: str
+    status: str
+    # Place in the queue while waiting, 1 being next
+    position: Optional[int] = None
+    order_id: Optional[str] = None
+
+async def place_booking(order: OrderDetails, join_waitlist: bool, db: AsyncSession,
+                        on_booked: Optional[Callable[[Order], None]] = None) -> Union[Order, WaitlistStatus]:
+    """Book the requested seat, or queue for it; returns the order, or the waitlist entry when queued."""
     # Validate customer
-    customer = db.query(Customer).filter(Customer.customer_id == order.customer_id).first()
+    customer = await db.scalar(select(Customer.customer_id).where(Customer.customer_id == order.customer_id))
     if not customer:
         raise HTTPException(status_code=400, detail="Invalid customer ID")
     
-    # Validate gym
-    gym = db.query(Gym).filter(Gym.gym_id == order.gym_id).first()
+    # Validate gym, usually served from the catalog cache
+    gym = await catalog.get_gym(db, order.gym_id)
     if not gym:
         raise HTTPException(status_code=400, detail="Invalid gym ID")
     
-    # Validate slot
-    slot = db.query(Slot).filter(Slot.slot_id == order.slot_id).first()
-    if not slot:
-        raise HTTPException(status_code=400, detail="Invalid slot ID")
-    
     # Validate order time
     now = datetime.now()
     if order.order_time <= now:
         raise HTTPException(status_code=400, detail="Invalid order time")
     
-    # Check if the slot is available
-    if slot.available_capacity <= 0:
-        raise HTTPException(status_code=400, detail="Slot not available")
-    
-    # Assuming other validations and checks...
-    
-    order.order_time = datetime.now()
-    order.status = "Created"
-    order.order_id = generate_id()
-    db.add(order)
-    db.commit()
-    db.refresh(order)
-
-    # Decrease slot capacity when an order is created
-    slot = db.query(Slot).filter(Slot.slot_id == order.slot_id).first()
-    if slot:
-        slot.available_capacity -= 1
-        db.commit()
+    # Reserve a seat and insert the order atomically
+    try:
+        new_order = await book_slot(db, order.customer_id, order.gym_id, order.slot_id, on_booked)
+    except SlotUnavailable:
+        # Only pay for the lookup when the reservation failed, to report the right error
+        slot = await catalog.get_slot(db, order.slot_id)
+        if not slot or slot.gym_id != order.gym_id:
+            raise HTTPException(status_code=400, detail="Invalid slot ID")
+        if not join_waitlist:
+            raise HTTPException(status_code=400, detail="Slot not available")
+        try:
+            new_order, entry = await waitlist.book_or_wait(db, order.customer_id, order.gym_id, order.slot_id,
+                                                           on_booked)
+        except BookingContention:
+            raise HTTPException(status_code=503, detail="Slot is busy, please retry", headers={"Retry-After": "1"})
+        if entry is not None:
+            # Queued; the client follows up with GET /order/waitlist/{entry_id}
+            return WaitlistStatus(**await waitlist.entry_status(db, entry.entry_id, order.customer_id))
+    except BookingContention:
+        raise HTTPException(status_code=503, detail="Slot is busy, please retry", headers={"Retry-After": "1"})
     
-    return order
+    return new_order
+
+async def place_booking_once(order: OrderDetails, join_waitlist: bool, db: AsyncSession,
+                             key: str) -> Tuple[StoredResponse, bool]:
+    """place_booking at most once per key; returns the response and whether it is a replay."""
+    request_hash = idempotency.fingerprint(order.model_dump_json(), str(join_waitlist))
+    replayed = True
+
+    async def execute() -> StoredResponse:
+        nonlocal replayed
+        # Checked before anything else, so a replay reads no slot or order rows
+        response = await idempotency.store.lookup(db, key)
+        if response is not None:
+            return response
+
+        booked = None
 
-@order_router.put("/update_order_status/{order_id}")
-def update_order_status(order_id: int, new_status: str, db: Session = Depends(get_db)):
-    allowed_statuses = ["Created", "Confirmed", "Cancelled"]
-    if new_status not in allowed_statuses:
+        def on_booked(new_order: Order):
+            nonlocal booked
+            booked = StoredResponse(request_hash, 200, OrderDetails.model_validate(new_order).model_dump_json())
+            db.add(idempotency.store.record(key, booked))
+
+        try:
+            result = await place_booking(order, join_waitlist, db, on_booked)
+        except IntegrityError:
+            # A duplicate running on another worker committed its booking first
+            await db.rollback()
+            expect_repeated_queries()
+            response = await idempotency.store.lookup(db, key)
+            if response is None:
+                raise
+            return response
+        replayed = False
+        if isinstance(result, WaitlistStatus):
+            # Joining the queue twice is harmless, so this is stored after the fact
+            response = StoredResponse(request_hash, 202, result.model_dump_json())
+            await idempotency.store.save(db, key, response)
+            return response
+        idempotency.store.remember(key, booked)
+        return booked
+
+    response = await idempotency.store.run(key, execute)
+    if response.fingerprint != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    return response, replayed
+
+@order_router.post("/create_order/", response_model=OrderDetails, responses={202: {"model": WaitlistStatus}},
+                   dependencies=[limit("create_order", customer_principal)])
+async def create_order(order: OrderDetails, join_waitlist: bool = False,
+                       idempotency_key: Optional[str] = Header(
+                           None, min_length=1, max_length=idempotency.MAX_IDEMPOTENCY_KEY_LENGTH),
+                       db: AsyncSession = Depends(get_db), current_user: Customer = Depends(get_current_user)):
+    """Book a seat. Retries sent with the same Idempotency-Key get the first response back instead of booking again."""
+    if idempotency_key is None:
+        result = await place_booking(order, join_waitlist, db)
+        if isinstance(result, WaitlistStatus):
+            return JSONResponse(status_code=202, content=result.model_dump())
+        return result
+
+    # Keys are per customer, so one customer cannot replay another's response
+    key = f"create_order:{current_user.customer_id}:{idempotency_key}"
+    response, replayed = await place_booking_once(order, join_waitlist, db, key)
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return Response(content=response.body, status_code=response.status_code, media_type="application/json",
+                    headers=headers)
+
+@order_router.get("/waitlist/{entry_id}", response_model=WaitlistStatus)
+async def waitlist_status(entry_id: int, wait: float = Query(0, ge=0, le=waitlist.MAX_WAITLIST_WAIT),
+                          current_user: Customer = Depends(get_current_user)):
+    """Long-poll: with wait > 0, answer as soon as the entry leaves the queue or wait seconds pass."""
+    expect_repeated_queries()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        # A session per check, so a long-poll holds no pooled connection while it waits
+        async with SessionLocal() as db:
+            status = await waitlist.entry_status(db, entry_id, current_user.customer_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Waitlist entry not found")
+        remaining = deadline - loop.time()
+        if status["status"] != "Waiting" or remaining <= 0:
+            return status
+        await waitlist.notifier.wait(entry_id, min(remaining, waitlist.WAITLIST_POLL_INTERVAL))
+
+@order_router.delete("/waitlist/{entry_id}", response_model=Message)
+async def leave_waitlist(entry_id: int, db: AsyncSession = Depends(get_db),
+                         current_user: Customer = Depends(get_current_user)):
+    if not await waitlist.leave(db, entry_id, current_user.customer_id):
+        raise HTTPException(status_code=404, detail="No waiting entry found")
+    return {"message": "Left the waitlist"}
+
+@order_router.put("/update_order_status/{order_id}", status_code=202, response_model=Message)
+async def update_order_status(order_id: str, new_status: Status, db: AsyncSession = Depends(get_db)):
+    if new_status == Status.Created:
         raise HTTPException(status_code=400, detail="Invalid status")
     
-    order = db.query(Order).filter(Order.order_id == order_id).first()
-    if not order:
+    # The transition is applied asynchronously by the order event consumer
+    if not await enqueue_transition(db, order_id, new_status.value):
         raise HTTPException(status_code=404, detail="Order not found")
+    consumer.notify()
     
-    # Restore slot capacity if order status changes from "Confirmed" or "Pending" to "Cancelled" or "Failed"
-    if order.status in ["Created", "Confirmed", "Pending"] and new_status in ["Failed"]:
-        slot = db.query(Slot).filter(Slot.slot_id == order.slot_id).first()
-        if slot:
-            slot.available_capacity += 1
-            db.commit()
-    
-    order.status = new_status
-    db.commit()
-    
-    return {"message": f"Order status updated to {new_status}"}
+    return {"message": f"Order status update to {new_status.value} accepted"}
 
-@order_router.put("/cancel_order/{order_id}")
-def cancel_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.query(Order).filter(Order.order_id == order_id).first()
-    if not order:
+@order_router.put("/cancel_order/{order_id}", status_code=202, response_model=Message)
+async def cancel_order(order_id: str, db: AsyncSession = Depends(get_db)):
+    if not await enqueue_transition(db, order_id, Status.Cancelled.value):
         raise HTTPException(status_code=404, detail="Order not found")
+    consumer.notify()
     
-    # Assuming you have additional logic to check if the order can be cancelled
-    
-    order.status = "Cancelled"  # Update the status
-    db.commit()
-    
-    return {"message": "Order cancelled"}
\ No newline at end of file
+    return {"message": "Order cancellation accepted"}
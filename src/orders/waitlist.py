@@ -0,0 +1,148 @@
+import asyncio
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models.order import Order
+from src.models.waitlist import WaitlistEntry
+from .booking import BookingContention, place_order, reserve_slot
+
+# How often a long-poll rechecks the database for promotions made by other workers
+WAITLIST_POLL_INTERVAL = float(os.environ.get("WAITLIST_POLL_INTERVAL", 1.0))
+MAX_WAITLIST_WAIT = float(os.environ.get("MAX_WAITLIST_WAIT", 30))
+
+
+async def book_or_wait(db: AsyncSession, customer_id: str, gym_id: str, slot_id: str,
+                       on_booked: Optional[Callable[[Order], None]] = None
+                       ) -> Tuple[Optional[Order], Optional[WaitlistEntry]]:
+    """Book a seat if one has come free since the first attempt, otherwise join the slot's queue.
+
+    Both happen in one write transaction, so a seat released concurrently is
+    either taken here or is handed to this entry by the releasing transaction.
+    """
+    try:
+        start_time = await reserve_slot(db, slot_id, gym_id)
+        if start_time is not None:
+            order = await place_order(db, customer_id, gym_id, slot_id, start_time)
+            if on_booked:
+                on_booked(order)
+            await db.commit()
+            return order, None
+
+        # Joining twice keeps the original place in the queue
+        entry = await db.scalar(
+            select(WaitlistEntry).where(
+                WaitlistEntry.slot_id == slot_id,
+                WaitlistEntry.customer_id == customer_id,
+                WaitlistEntry.status == "Waiting",
+            )
+        )
+        if entry is None:
+            entry = WaitlistEntry(
+                slot_id=slot_id, gym_id=gym_id, customer_id=customer_id, created_at=datetime.now(), status="Waiting"
+            )
+            db.add(entry)
+        await db.commit()
+        return None, entry
+    except OperationalError:
+        await db.rollback()
+        raise BookingContention(slot_id)
+
+
+async def promote(db: AsyncSession, slot_id: str, seats: int, start_time: datetime) -> List[WaitlistEntry]:
+    """Turn up to seats entries at the head of the slot's queue into orders; the caller commits."""
+    entries = (await db.scalars(
+        select(WaitlistEntry)
+        .where(WaitlistEntry.slot_id == slot_id, WaitlistEntry.status == "Waiting")
+        .order_by(WaitlistEntry.entry_id)
+        .limit(seats)
+    )).all()
+    for entry in entries:
+        order = await place_order(db, entry.customer_id, entry.gym_id, slot_id, start_time)
+        entry.status = "Promoted"
+        entry.order_id = order.order_id
+        entry.promoted_at = order.order_time
+    return entries
+
+
+async def entry_status(db: AsyncSession, entry_id: int, customer_id: str) -> Optional[dict]:
+    entry = await db.scalar(
+        select(WaitlistEntry).where(WaitlistEntry.entry_id == entry_id, WaitlistEntry.customer_id == customer_id)
+    )
+    if entry is None:
+        return None
+    position = None
+    if entry.status == "Waiting":
+        position = await db.scalar(
+            select(func.count())
+            .select_from(WaitlistEntry)
+            .where(
+                WaitlistEntry.slot_id == entry.slot_id,
+                WaitlistEntry.status == "Waiting",
+                WaitlistEntry.entry_id <= entry.entry_id,
+            )
+        )
+    return {
+        "entry_id": entry.entry_id,
+        "slot_id": entry.slot_id,
+        "status": entry.status,
+        "position": position,
+        "order_id": entry.order_id,
+    }
+
+
+async def leave(db: AsyncSession, entry_id: int, customer_id: str) -> bool:
+    result = await db.execute(
+        update(WaitlistEntry)
+        .where(
+            WaitlistEntry.entry_id == entry_id,
+            WaitlistEntry.customer_id == customer_id,
+            WaitlistEntry.status == "Waiting",
+        )
+        .values(status="Left")
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+class WaitlistNotifier:
+    """Wakes long-polls in this worker as soon as their entry is promoted.
+
+    Promotions made by another worker's consumer are noticed on the next
+    WAITLIST_POLL_INTERVAL recheck instead.
+    """
+
+    def __init__(self):
+        self._events: Dict[int, asyncio.Event] = {}
+        self._waiters = Counter()
+        self.notified = 0
+
+    async def wait(self, entry_id: int, timeout: float):
+        event = self._events.setdefault(entry_id, asyncio.Event())
+        self._waiters[entry_id] += 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters[entry_id] -= 1
+            if not self._waiters[entry_id]:
+                del self._waiters[entry_id]
+                self._events.pop(entry_id, None)
+
+    def notify(self, entry_ids: Iterable[int]):
+        for entry_id in entry_ids:
+            event = self._events.get(entry_id)
+            if event is not None:
+                event.set()
+                self.notified += 1
+
+    def stats(self) -> dict:
+        return {"waiting_polls": sum(self._waiters.values()), "notified": self.notified}
+
+
+notifier = WaitlistNotifier()
@@ -0,0 +1,201 @@
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import case, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from src.models.ratelimit import RateLimitBucket
+from src.utils.cache import TTLCache
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+# Most distinct clients and principals the in-memory backend tracks at once
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", 100000))
+# Only trust X-Forwarded-For when a proxy we control sets it
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get("RATE_LIMIT_TRUST_FORWARDED", "0") == "1"
+
+
+@dataclass(frozen=True)
+class Bucket:
+    rate: float  # tokens added per second
+    burst: int  # bucket size
+
+
+@dataclass(frozen=True)
+class RouteBudget:
+    per_ip: Optional[Bucket] = None
+    per_principal: Optional[Bucket] = None
+    # Requests served at once by this worker; beyond it new ones are shed
+    max_in_flight: Optional[int] = None
+
+
+# Every limited route and its budget, in one place
+ROUTE_BUDGETS: Dict[str, RouteBudget] = {
+    "customer_login": RouteBudget(per_ip=Bucket(5, 20), per_principal=Bucket(5 / 60, 5), max_in_flight=64),
+    "vendor_login": RouteBudget(per_ip=Bucket(5, 20), per_principal=Bucket(5 / 60, 5), max_in_flight=64),
+    "customer_signup": RouteBudget(per_ip=Bucket(1, 10), max_in_flight=32),
+    "vendor_signup": RouteBudget(per_ip=Bucket(1, 10), max_in_flight=32),
+    "create_order": RouteBudget(per_ip=Bucket(20, 50), per_principal=Bucket(5, 10), max_in_flight=64),
+}
+
+
+class RateLimitBackend(ABC):
+    """Stores token buckets; a shared backend lets several workers enforce one budget."""
+
+    @abstractmethod
+    async def take(self, key: str, bucket: Bucket) -> float:
+        """Take a token; returns 0 on success, else the seconds until one is available."""
+
+
+class LocalRateLimitBackend(RateLimitBackend):
+    """Buckets in this process only, bounded by an LRU so a flood of clients cannot grow it without limit."""
+
+    def __init__(self, maxsize: int = RATE_LIMIT_MAX_KEYS):
+        self.buckets = TTLCache(maxsize=maxsize)
+
+    async def take(self, key: str, bucket: Bucket) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self.buckets.get(key, (bucket.burst, now))
+        tokens = min(bucket.burst, tokens + (now - updated_at) * bucket.rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / bucket.rate
+        if not wait:
+            tokens -= 1
+        # Once full again a bucket is the same as a missing one, so it can expire then
+        self.buckets.set(key, (tokens, now), ttl=(bucket.burst - tokens) / bucket.rate)
+        return wait
+
+
+class DatabaseRateLimitBackend(RateLimitBackend):
+    """Buckets in the application database, shared by every worker that uses it.
+
+    Each decision is a single upsert, so concurrent workers cannot both spend
+    the last token. It costs a write per limited request.
+    """
+
+    upserts = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+
+    async def take(self, key: str, bucket: Bucket) -> float:
+        now = time.time()
+        async with self.session_factory() as db:
+            stmt = self.upserts[db.get_bind().dialect.name](RateLimitBucket).values(
+                key=key, tokens=bucket.burst - 1, updated_at=now
+            )
+            refilled = RateLimitBucket.tokens + (now - RateLimitBucket.updated_at) * bucket.rate
+            refilled = case((refilled < bucket.burst, refilled), else_=bucket.burst)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["key"],
+                set_={"tokens": refilled - 1, "updated_at": now},
+                where=refilled >= 1,
+            ).returning(RateLimitBucket.tokens)
+            taken = await db.scalar(stmt)
+            await db.commit()
+            if taken is not None:
+                return 0.0
+            row = (await db.execute(
+                select(RateLimitBucket.tokens, RateLimitBucket.updated_at).where(RateLimitBucket.key == key)
+            )).first()
+        tokens = min(bucket.burst, row.tokens + (now - row.updated_at) * bucket.rate)
+        return max(0.0, (1 - tokens) / bucket.rate)
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimiter:
+    """Token bucket limits per client IP and principal, plus a per-route cap on concurrent requests."""
+
+    def __init__(self, budgets: Dict[str, RouteBudget], backend: Optional[RateLimitBackend] = None,
+                 enabled: bool = True):
+        self.budgets = budgets
+        self.enabled = enabled
+        self.backend = backend or LocalRateLimitBackend()
+        self.in_flight = Counter()
+        self.decisions: Dict[Tuple[str, str], int] = Counter()
+
+    def use_backend(self, backend: RateLimitBackend):
+        self.backend = backend
+
+    async def check(self, route: str, ip: str, principal: Optional[str] = None):
+        budget = self.budgets[route]
+        wait = 0.0
+        if budget.per_ip:
+            wait = await self.backend.take(f"{route}:ip:{ip}", budget.per_ip)
+        # Keyed by principal as well, so one account cannot be attacked from many addresses
+        if not wait and budget.per_principal and principal is not None:
+            wait = await self.backend.take(f"{route}:principal:{principal}", budget.per_principal)
+        if wait:
+            self.decisions[(route, "limited")] += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please retry later",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    @contextmanager
+    def admit(self, route: str):
+        # Shed before the worker is saturated, rather than letting every request queue
+        limit = self.budgets[route].max_in_flight
+        if limit is not None and self.in_flight[route] >= limit:
+            self.decisions[(route, "shed")] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.decisions[(route, "allowed")] += 1
+        self.in_flight[route] += 1
+        try:
+            yield
+        finally:
+            self.in_flight[route] -= 1
+
+    def stats(self) -> dict:
+        return {
+            route: {
+                "allowed": self.decisions[(route, "allowed")],
+                "limited": self.decisions[(route, "limited")],
+                "shed": self.decisions[(route, "shed")],
+                "in_flight": self.in_flight[route],
+            }
+            for route in self.budgets
+        }
+
+
+limiter = RateLimiter(ROUTE_BUDGETS, enabled=RATE_LIMIT_ENABLED)
+
+
+def _no_principal() -> None:
+    return None
+
+
+def login_principal(form_data: OAuth2PasswordRequestForm = Depends()) -> str:
+    # FastAPI caches dependencies per request, so the login form is parsed once
+    return form_data.username
+
+
+def limit(route: str, principal: Callable = _no_principal):
+    """Route dependency enforcing the named budget; principal is a dependency returning the caller's key."""
+
+    async def dependency(request: Request, principal_key: Optional[str] = Depends(principal)):
+        if not limiter.enabled:
+            yield
+            return
+        await limiter.check(route, client_ip(request), principal_key)
+        with limiter.admit(route):
+            yield
+
+    return Depends(dependency)
@@ -0,0 +1,103 @@
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import exists, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.models.base import get_db
+from src.models.gym_slot import Gym, Slot
+from src.customer.login import get_current_user
+from src.utils.pagination import encode_cursor, decode_cursor
+
+slot_router = APIRouter(
+    prefix="/slots",
+    tags=["slots"],
+    dependencies=[Depends(get_current_user)],
+    responses={403: {"description": "Forbidden"}},
+)
+
+MAX_PAGE_SIZE = 200
+
+
+def _naive(value: datetime) -> datetime:
+    # Slot times are stored naive, in server local time like datetime.now();
+    # a bound with an offset is converted to that, so the two can be compared
+    if value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+class SlotResult(BaseModel):
+    slot_id: str
+    gym_id: str
+    gym_name: str
+    start_time: datetime
+    end_time: datetime
+    available_capacity: int
+
+
+class SlotPage(BaseModel):
+    items: List[SlotResult]
+    next_cursor: Optional[str] = None
+
+
+@slot_router.get("/search", response_model=SlotPage)
+async def search_slots(
+    start_after: datetime,
+    end_before: datetime,
+    gym_id: Optional[str] = None,
+    area: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    start_after, end_before = _naive(start_after), _naive(end_before)
+    if end_before <= start_after:
+        raise HTTPException(status_code=400, detail="end_before must be after start_after")
+
+    # Gyms are looked up per slot rather than joined: with a join, SQLite's
+    # planner can start from gym once it has table statistics and then sort
+    # every matching slot, while this way the (start_time, slot_id) or
+    # (gym_id, start_time) index drives the query and it stops at the limit.
+    gym_matches = (Gym.gym_id == Slot.gym_id, Gym.status == "Added")
+    if area:
+        gym_matches += (Gym.address.contains(area, autoescape=True),)
+    # Project only the columns we return instead of loading ORM objects
+    query = (
+        select(
+            Slot.slot_id,
+            Slot.gym_id,
+            select(Gym.name).where(Gym.gym_id == Slot.gym_id).scalar_subquery().label("gym_name"),
+            Slot.start_time,
+            Slot.end_time,
+            Slot.available_capacity,
+        )
+        .where(
+            Slot.end_time <= end_before,
+            Slot.available_capacity > 0,
+            exists().where(*gym_matches),
+        )
+    )
+    if gym_id:
+        query = query.where(Slot.gym_id == gym_id)
+    lower_bound = start_after
+    if cursor:
+        after_time, after_id = decode_cursor(cursor)
+        after = (_naive(after_time), after_id)
+        query = query.where(tuple_(Slot.start_time, Slot.slot_id) > after)
+        # Seek straight to the cursor: given start_after as well, SQLite seeks
+        # from there and filters its way through every earlier page
+        if after[0] >= start_after:
+            lower_bound = after[0]
+    query = query.where(Slot.start_time >= lower_bound)
+
+    # One extra row tells us whether there is another page
+    query = query.order_by(Slot.start_time, Slot.slot_id).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].start_time, rows[-1].slot_id)
+
+    return SlotPage(items=[SlotResult(**row._mapping) for row in rows], next_cursor=next_cursor)
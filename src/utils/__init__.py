@@ -1,5 +1 @@
-import uuid
-
-def generate_id():
-    return str(uuid.uuid4())
-
+from .ids import generate_id
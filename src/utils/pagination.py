@@ -0,0 +1,17 @@
+import base64
+from datetime import datetime
+from fastapi import HTTPException
+
+
+# Keyset cursors are the (timestamp, id) sort key of the last row on the previous page
+def encode_cursor(timestamp: datetime, key: str) -> str:
+    raw = f"{timestamp.isoformat()}|{key}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, key = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(timestamp), key
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
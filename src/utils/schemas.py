@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+# Response bodies shared by several routers
+class Message(BaseModel):
+    message: str
+
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
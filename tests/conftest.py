@@ -0,0 +1,148 @@
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import httpx
+import pytest
+
+from benchmarks.run import generate_keys
+
+# The app reads its configuration when src is first imported, so set it up before any test does
+_workdir = Path(tempfile.mkdtemp(prefix="gyg-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_workdir / 'test.db'}"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["RATE_LIMIT_ENABLED"] = "0"
+# Tests sync revocations themselves, when they want another worker's to show up
+os.environ["REVOCATION_SYNC_INTERVAL"] = "3600"
+os.environ["JWT_PRIVATE_KEY"], os.environ["JWT_PUBLIC_KEY"] = generate_keys()
+
+PASSWORD = "test-password"
+
+
+# One event loop for the whole run: the app keeps asyncio primitives and pooled connections at module level
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session", autouse=True)
+async def event_loop_for_session(anyio_backend):
+    # Holding a session-scoped async fixture keeps anyio from starting a new loop per test
+    yield
+
+
+def _clear_caches():
+    from src.auth.revocations import revocations
+    from src.auth.tokens import principal_cache
+    from src.gym.catalog import catalog
+    from src.orders.idempotency import store
+
+    principal_cache.clear()
+    revocations.clear()
+    catalog.gyms.clear()
+    catalog.slots.clear()
+    store.cache.clear()
+
+
+@pytest.fixture
+async def app():
+    """The app running against an empty database."""
+    from src.app import app
+    from src.models.base import Base, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    _clear_caches()
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def make_customer(client):
+    """Sign up and log in a customer; returns (customer_id, auth headers)."""
+    count = 0
+
+    async def make_customer():
+        nonlocal count
+        count += 1
+        email = f"customer-{count}@example.com"
+        customer = {"first_name": "Test", "last_name": f"Customer {count}", "email": email,
+                    "phone_number": "+14155552671"}
+        signup = await client.post("/customer/signup/", params={"password": PASSWORD}, json=customer)
+        signup.raise_for_status()
+        login = await client.post("/customer/login", data={"username": email, "password": PASSWORD})
+        login.raise_for_status()
+        return signup.json()["customer_id"], {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    return make_customer
+
+
+@pytest.fixture
+def make_vendor(client):
+    """Sign up and log in a gym owner; returns auth headers."""
+    count = 0
+
+    async def make_vendor():
+        nonlocal count
+        count += 1
+        username = f"owner-{count}"
+        (await client.post("/vendor/signup", params={"username": username, "password": PASSWORD})).raise_for_status()
+        login = await client.post("/vendor/login", data={"username": username, "password": PASSWORD})
+        login.raise_for_status()
+        return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    return make_vendor
+
+
+@pytest.fixture
+def make_gym(client):
+    count = 0
+
+    async def make_gym(vendor_headers, capacity: int = 10) -> str:
+        nonlocal count
+        count += 1
+        gym = {"name": f"Gym {count}", "address": f"{count} Test Street", "capacity": capacity}
+        response = await client.post("/gym/add_gym/", json=gym, headers=vendor_headers)
+        response.raise_for_status()
+        return response.json()["gym_id"]
+
+    return make_gym
+
+
+@pytest.fixture
+def make_slot(client):
+    """Schedule one slot through bulk generation, so the occupancy counters see it; returns its id."""
+
+    async def make_slot(vendor_headers, gym_id: str, capacity: int = 10, day: date = None) -> str:
+        from sqlalchemy import select
+        from src.models import Slot
+        from src.models.base import SessionLocal
+
+        day = day or date.today() + timedelta(days=1)
+        spec = {"start_date": day.isoformat(), "end_date": day.isoformat(), "days": [day.weekday()],
+                "start_times": ["10:00"], "duration_minutes": 60, "capacity": capacity}
+        response = await client.post(f"/gym/{gym_id}/slots/generate", json=spec, headers=vendor_headers)
+        response.raise_for_status()
+        async with SessionLocal() as db:
+            return await db.scalar(
+                select(Slot.slot_id).where(Slot.gym_id == gym_id, Slot.start_time == datetime.combine(day, datetime.min.time()) + timedelta(hours=10))
+            )
+
+    return make_slot
+
+
+def order_body(customer_id: str, gym_id: str, slot_id: str) -> dict:
+    return {"order_id": "new", "customer_id": customer_id, "gym_id": gym_id, "slot_id": slot_id,
+            "order_time": (datetime.now() + timedelta(hours=1)).isoformat(), "status": "Created"}
+
+
+@pytest.fixture
+def order():
+    return order_body
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+from .conftest import PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+
+def bearer(headers: dict) -> str:
+    return headers["Authorization"].split()[1]
+
+
+async def test_logout_revokes_the_token(client, make_customer):
+    _, headers = await make_customer()
+    assert (await client.get("/customer/secure-route/", headers=headers)).status_code == 200
+    (await client.post("/customer/logout", headers=headers)).raise_for_status()
+    assert (await client.get("/customer/secure-route/", headers=headers)).status_code == 401
+
+
+async def test_password_change_revokes_earlier_tokens(client, make_customer):
+    _, headers = await make_customer()
+    response = await client.put("/customer/change_password", params={"old_password": PASSWORD, "new_password": "new"},
+                                headers=headers)
+    response.raise_for_status()
+    assert (await client.get("/customer/secure-route/", headers=headers)).status_code == 401
+
+    login = await client.post("/customer/login", data={"username": "customer-1@example.com", "password": "new"})
+    fresh = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert (await client.get("/customer/secure-route/", headers=fresh)).status_code == 200
+
+
+async def test_revocations_reach_other_workers(client, make_customer):
+    from src.auth.revocations import RevocationList, revocations
+    from src.auth.tokens import decode_access_token
+    from src.models.base import SessionLocal
+
+    _, headers = await make_customer()
+    claims = decode_access_token(bearer(headers), "customer")
+    other_worker = RevocationList(SessionLocal)
+    await other_worker.revoke_token(claims)
+    assert (await client.get("/customer/secure-route/", headers=headers)).status_code == 200
+
+    await revocations.sync()
+    assert (await client.get("/customer/secure-route/", headers=headers)).status_code == 401
+    # A worker starting later loads it too
+    restarted = RevocationList(SessionLocal)
+    await restarted.sync()
+    assert restarted.is_revoked(claims)
+
+
+async def test_revocations_last_until_the_token_expires(app):
+    from src.auth.revocations import RevocationList
+    from src.models.base import SessionLocal
+    from src.models.revocation import Revocation
+
+    revocations = RevocationList(SessionLocal)
+    now = time.time()
+    for i in range(200):
+        await revocations.revoke_token({"jti": f"live-{i}", "role": "customer", "sub": "a", "exp": now + 600})
+    await revocations.revoke_token({"jti": "expired", "role": "customer", "sub": "a", "exp": now - 1})
+    await revocations.sync()
+
+    # Nothing is evicted to make room, however many tokens are revoked
+    assert all(revocations.is_revoked({"jti": f"live-{i}"}) for i in range(200))
+    assert not revocations.is_revoked({"jti": "expired"})
+    await revocations.purge()
+    async with SessionLocal() as db:
+        assert await db.scalar(select(func.count()).select_from(Revocation)) == 200
+
+
+async def test_a_revocation_committed_out_of_id_order_is_picked_up(app):
+    from src.auth.revocations import RevocationList
+    from src.models.base import SessionLocal
+    from src.models.revocation import Revocation
+
+    worker = RevocationList(SessionLocal)
+    await worker.sync()
+    now = time.time()
+    async with SessionLocal() as db:
+        db.add(Revocation(revocation_id=1000, jti="first", role="customer", subject="a", revoked_at=now,
+                          expires_at=now + 600))
+        await db.commit()
+    await worker.sync()
+    # Given a lower id at insert, but committed after the row above was synced
+    async with SessionLocal() as db:
+        db.add(Revocation(revocation_id=500, jti="late", role="customer", subject="b", revoked_at=now,
+                          expires_at=now + 600))
+        await db.commit()
+    await worker.sync()
+    assert worker.is_revoked({"jti": "first"})
+    assert worker.is_revoked({"jti": "late"})
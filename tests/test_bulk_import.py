@@ -0,0 +1,138 @@
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+pytestmark = pytest.mark.anyio
+
+
+def ndjson(*orders) -> bytes:
+    return b"".join(json.dumps(order).encode() + b"\n" for order in orders)
+
+
+def imported(order_id, customer_id, gym_id, slot_id) -> dict:
+    return {"order_id": order_id, "customer_id": customer_id, "gym_id": gym_id, "slot_id": slot_id,
+            "order_time": datetime.now().isoformat(), "status": "Confirmed"}
+
+
+async def upload(client, headers, content: bytes, filename: str = "orders.ndjson"):
+    response = await client.post("/gym/orders/import", files={"file": (filename, content)}, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+async def order_count() -> int:
+    from src.models import Order
+    from src.models.base import SessionLocal
+
+    async with SessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(Order))
+
+
+@pytest.fixture
+async def gym(make_customer, make_vendor, make_gym, make_slot):
+    vendor = await make_vendor()
+    gym_id = await make_gym(vendor)
+    slot_id = await make_slot(vendor, gym_id)
+    customer_id, _ = await make_customer()
+    return {"vendor": vendor, "gym_id": gym_id, "slot_id": slot_id, "customer_id": customer_id}
+
+
+async def test_importing_the_same_file_twice_rejects_the_repeats(client, gym):
+    content = ndjson(*(imported(f"import-{i}", gym["customer_id"], gym["gym_id"], gym["slot_id"]) for i in range(3)))
+    assert (await upload(client, gym["vendor"], content))["inserted"] == 3
+
+    report = await upload(client, gym["vendor"], content)
+    assert (report["inserted"], report["rejected"]) == (0, 3)
+    assert "line 1: order import-0 already exists" in report["errors"]
+    assert await order_count() == 3
+
+
+async def test_repeated_id_within_a_file(client, gym):
+    order = imported("import-0", gym["customer_id"], gym["gym_id"], gym["slot_id"])
+    report = await upload(client, gym["vendor"], ndjson(order, order))
+    assert (report["inserted"], report["rejected"]) == (1, 1)
+    assert report["errors"] == ["line 2: order import-0 already exists"]
+
+
+async def test_slots_and_customers_are_checked(client, gym, make_vendor, make_gym, make_slot):
+    other_vendor = await make_vendor()
+    other_slot = await make_slot(other_vendor, await make_gym(other_vendor))
+    report = await upload(client, gym["vendor"], ndjson(
+        # Another gym's slot booked under one of ours
+        imported("import-0", gym["customer_id"], gym["gym_id"], other_slot),
+        imported("import-1", "no-such-customer", gym["gym_id"], gym["slot_id"]),
+        imported("import-2", gym["customer_id"], gym["gym_id"], gym["slot_id"]),
+    ))
+    assert (report["inserted"], report["rejected"]) == (1, 2)
+    assert report["errors"] == [
+        f"line 1: slot {other_slot} is not a slot of gym {gym['gym_id']}",
+        "line 2: customer no-such-customer does not exist",
+    ]
+
+
+async def test_undecodable_and_overlong_lines_are_rejected_alone(client, gym):
+    from src.gym.bulk import MAX_LINE_BYTES, READ_SIZE
+
+    good = [imported(f"import-{i}", gym["customer_id"], gym["gym_id"], gym["slot_id"]) for i in range(2)]
+    content = (
+        ndjson(good[0])
+        + b'{"order_id": "\xff"}\n'
+        # Longer than the cap and spanning several reads
+        + b"x" * (MAX_LINE_BYTES + 2 * READ_SIZE) + b"\n"
+        + ndjson(good[1])
+    )
+    report = await upload(client, gym["vendor"], content)
+    assert (report["inserted"], report["rejected"]) == (2, 2)
+    assert report["errors"][0].startswith("line 2: 'utf-8' codec can't decode")
+    assert report["errors"][1] == f"line 3: line is longer than {MAX_LINE_BYTES} bytes"
+
+
+async def test_csv_import(client, gym):
+    content = (
+        "order_id,customer_id,gym_id,slot_id,order_time,status\n"
+        f"csv-0,{gym['customer_id']},{gym['gym_id']},{gym['slot_id']},{datetime.now().isoformat()},Confirmed\n"
+        "csv-1,\xe9,broken\n"
+    ).encode("latin-1")
+    report = await upload(client, gym["vendor"], content, filename="orders.csv")
+    assert (report["inserted"], report["rejected"]) == (1, 1)
+
+
+async def test_imported_orders_take_seats(client, make_customer, make_vendor, make_gym, make_slot):
+    from src.models import Slot
+    from src.models.base import SessionLocal
+    from src.orders.events import consumer
+
+    # The app's consumer would race the batch run below
+    await consumer.stop()
+    vendor = await make_vendor()
+    gym_id = await make_gym(vendor)
+    slot_id = await make_slot(vendor, gym_id, capacity=2)
+    customer_id, headers = await make_customer()
+    cancelled = {**imported("import-3", customer_id, gym_id, slot_id), "status": "Cancelled"}
+    report = await upload(client, vendor, ndjson(
+        *(imported(f"import-{i}", customer_id, gym_id, slot_id) for i in range(3)), cancelled))
+    assert (report["inserted"], report["rejected"]) == (3, 1)
+    assert report["errors"] == [f"line 3: slot {slot_id} is full"]
+
+    async def seats_left() -> int:
+        async with SessionLocal() as db:
+            return await db.scalar(select(Slot.available_capacity).where(Slot.slot_id == slot_id))
+
+    assert await seats_left() == 0
+    (await client.put("/order/cancel_order/import-0", headers=headers)).raise_for_status()
+    assert await consumer.process_batch() == 1
+    # The seat the import took comes back, and no more
+    assert await seats_left() == 1
+
+
+async def test_chunked_imports_are_not_reported_as_n_plus_one(client, gym, monkeypatch):
+    from src.gym import bulk
+    from src.metrics.instrumentation import RouteMetrics, registry
+
+    before = registry.routes.get(("POST", "/gym/orders/import"), RouteMetrics()).n_plus_one
+    monkeypatch.setattr(bulk, "CHUNK_SIZE", 2)
+    content = ndjson(*(imported(f"import-{i}", gym["customer_id"], gym["gym_id"], gym["slot_id"]) for i in range(5)))
+    assert (await upload(client, gym["vendor"], content))["inserted"] == 5
+    assert registry.routes[("POST", "/gym/orders/import")].n_plus_one == before
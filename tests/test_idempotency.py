@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import anyio
+import pytest
+from sqlalchemy import func, select, update
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def booking(make_customer, make_vendor, make_gym, make_slot, order):
+    vendor = await make_vendor()
+    gym_id = await make_gym(vendor)
+    slot_id = await make_slot(vendor, gym_id)
+    customer_id, headers = await make_customer()
+    return order(customer_id, gym_id, slot_id), {**headers, "Idempotency-Key": "booking-1"}
+
+
+async def order_count() -> int:
+    from src.models import Order
+    from src.models.base import SessionLocal
+
+    async with SessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(Order))
+
+
+async def test_a_replay_returns_the_first_response(client, booking):
+    body, headers = booking
+    first = await client.post("/order/create_order/", json=body, headers=headers)
+    first.raise_for_status()
+    replay = await client.post("/order/create_order/", json=body, headers=headers)
+    assert replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+    assert await order_count() == 1
+
+    changed = await client.post("/order/create_order/", json={**body, "status": "Confirmed"}, headers=headers)
+    assert changed.status_code == 422
+
+
+async def test_concurrent_duplicates_book_once(client, booking):
+    body, headers = booking
+    responses = []
+
+    async def send():
+        responses.append(await client.post("/order/create_order/", json=body, headers=headers))
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(5):
+            tg.start_soon(send)
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.json()["order_id"] for response in responses}) == 1
+    assert await order_count() == 1
+
+
+async def test_a_duplicate_committed_by_another_worker_is_replayed(client, booking, monkeypatch):
+    from src.orders.idempotency import store
+
+    body, headers = booking
+    first = await client.post("/order/create_order/", json=body, headers=headers)
+    first.raise_for_status()
+
+    # Another worker's duplicate that looked before the first one committed
+    lookup = store.lookup
+    missed = []
+
+    async def late_lookup(db, key):
+        if not missed:
+            missed.append(key)
+            return None
+        return await lookup(db, key)
+
+    store.cache.clear()
+    monkeypatch.setattr(store, "lookup", late_lookup)
+    replay = await client.post("/order/create_order/", json=body, headers=headers)
+    assert replay.status_code == 200
+    assert replay.json() == first.json()
+    assert await order_count() == 1
+
+
+async def test_an_expired_key_can_be_reused_before_the_purge(client, booking):
+    from src.models import IdempotencyRecord
+    from src.models.base import SessionLocal
+    from src.orders.idempotency import store
+
+    body, headers = booking
+    first = await client.post("/order/create_order/", json=body, headers=headers)
+    first.raise_for_status()
+    async with SessionLocal() as db:
+        await db.execute(update(IdempotencyRecord).values(created_at=datetime.now() - store.ttl))
+        await db.commit()
+    store.cache.clear()
+
+    again = await client.post("/order/create_order/", json=body, headers=headers)
+    assert again.status_code == 200
+    assert "Idempotent-Replayed" not in again.headers
+    assert again.json()["order_id"] != first.json()["order_id"]
+    assert await order_count() == 2
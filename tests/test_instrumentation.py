@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import select
+
+pytestmark = pytest.mark.anyio
+
+
+@contextmanager
+def request_stats():
+    """Count statements and rows as the middleware does for a request."""
+    from src.metrics.instrumentation import RequestStats, _request_stats
+
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+
+async def test_buffered_results_are_counted(make_customer):
+    from src.models import Customer
+    from src.models.base import SessionLocal
+
+    for _ in range(3):
+        await make_customer()
+    with request_stats() as stats:
+        async with SessionLocal() as db:
+            assert len((await db.scalars(select(Customer))).all()) == 3
+    assert stats.rows == 3
+
+
+async def test_streamed_results_are_not_buffered(make_customer):
+    from src.metrics.instrumentation import count_rows
+    from src.models import Customer
+    from src.models.base import SessionLocal
+
+    for _ in range(3):
+        await make_customer()
+    with request_stats() as stats:
+        async with SessionLocal() as db:
+            result = await db.stream(select(Customer.customer_id))
+            # Still a live cursor: nothing has been fetched or counted yet
+            assert stats.rows == 0
+            assert not result._real_result._soft_closed
+            rows = 0
+            async for _ in result:
+                rows += 1
+            count_rows(rows)
+    assert stats.rows == 3
+
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from src.models.base import Base
+from src.models.migrations import MigrationError, upgrade_schema
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_adds_missing_indexes(engine):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_customer_email")
+        conn.exec_driver_sql("DROP INDEX ix_slot_gym_id_start_time")
+        assert sorted(upgrade_schema(conn)) == ["ix_customer_email", "ix_slot_gym_id_start_time"]
+        assert upgrade_schema(conn) == []
+
+
+def test_duplicate_emails_stop_the_upgrade(engine):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_customer_email")
+        for customer_id in ("a", "b"):
+            conn.execute(text("INSERT INTO customer (customer_id, email) VALUES (:id, 'same@example.com')"),
+                         {"id": customer_id})
+    with engine.begin() as conn:
+        with pytest.raises(MigrationError, match="ix_customer_email.*same@example.com"):
+            upgrade_schema(conn)
+    assert "ix_customer_email" not in {index["name"] for index in inspect(engine).get_indexes("customer")}
+
+
+def test_integer_customer_id_becomes_text(engine):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE login_credential")
+        conn.exec_driver_sql(
+            "CREATE TABLE login_credential (credential_id VARCHAR(50) PRIMARY KEY, customer_id INTEGER UNIQUE, "
+            "username VARCHAR(50) UNIQUE, password VARCHAR(100), registration_date DATETIME)"
+        )
+        conn.exec_driver_sql("INSERT INTO login_credential VALUES ('c1', 42, 'someone@example.com', 'hash', NULL)")
+    with engine.begin() as conn:
+        upgrade_schema(conn)
+
+    columns = {column["name"]: column["type"] for column in inspect(engine).get_columns("login_credential")}
+    assert "CHAR" in str(columns["customer_id"]).upper()
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT customer_id, typeof(customer_id), username FROM login_credential")).one()
+    assert tuple(row) == ("42", "text", "someone@example.com")
+    # Lookups by the string id the rest of the schema uses now match
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM login_credential WHERE customer_id = '42'")).scalar() == 1
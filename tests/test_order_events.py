@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+
+import anyio
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def two_orders(client, make_customer, make_vendor, make_gym, make_slot, order):
+    from src.orders.events import consumer
+
+    # The app's consumer would race the one each test runs
+    await consumer.stop()
+    vendor = await make_vendor()
+    gym_id = await make_gym(vendor)
+    customer_id, headers = await make_customer()
+    orders = []
+    for days in (1, 2):
+        slot_id = await make_slot(vendor, gym_id, day=date.today() + timedelta(days=days))
+        response = await client.post("/order/create_order/", json=order(customer_id, gym_id, slot_id), headers=headers)
+        response.raise_for_status()
+        orders.append((response.json()["order_id"], slot_id))
+    return orders
+
+
+async def cancel(order_ids):
+    from src.models.base import SessionLocal
+    from src.orders.events import enqueue_transition
+
+    async with SessionLocal() as db:
+        for order_id in order_ids:
+            assert await enqueue_transition(db, order_id, "Cancelled")
+
+
+async def statuses(order_ids) -> list:
+    from src.models import Order
+    from src.models.base import SessionLocal
+
+    async with SessionLocal() as db:
+        found = dict((await db.execute(select(Order.order_id, Order.status).where(Order.order_id.in_(order_ids)))).all())
+    return [found[order_id] for order_id in order_ids]
+
+
+async def run_until(consumer, done):
+    consumer.start()
+    try:
+        with anyio.fail_after(10):
+            while not done():
+                await anyio.sleep(0.01)
+    finally:
+        await consumer.stop()
+
+
+async def test_an_event_that_keeps_failing_is_dead_lettered(two_orders, monkeypatch):
+    from src.models import OrderEventDeadLetter
+    from src.models.base import SessionLocal
+    from src.orders import events
+
+    (poison, poison_slot), (healthy, _) = two_orders
+    promote = events.promote
+
+    async def failing_promote(db, slot_id, seats, start_time):
+        if slot_id == poison_slot:
+            raise RuntimeError("cannot promote")
+        return await promote(db, slot_id, seats, start_time)
+
+    monkeypatch.setattr(events, "promote", failing_promote)
+    await cancel([poison, healthy])
+    consumer = events.OrderEventConsumer(SessionLocal, batch_size=10, poll_interval=0.001, max_attempts=2,
+                                         max_backoff=0.01)
+    await run_until(consumer, lambda: consumer.dead_lettered == 1 and consumer.applied == 1)
+
+    # Two failed batches, then two failures of the poison event alone
+    assert consumer.failures == 4
+    assert await statuses([poison, healthy]) == ["Created", "Cancelled"]
+    async with SessionLocal() as db:
+        letter = await db.scalar(select(OrderEventDeadLetter))
+    assert (letter.order_id, letter.to_status) == (poison, "Cancelled")
+    assert "cannot promote" in letter.error
+
+
+async def test_transient_errors_only_back_off(two_orders):
+    from src.models.base import SessionLocal
+    from src.orders import events
+
+    order_ids = [order_id for order_id, _ in two_orders]
+    await cancel(order_ids)
+    consumer = events.OrderEventConsumer(SessionLocal, batch_size=10, poll_interval=0.001, max_attempts=2,
+                                         max_backoff=0.01)
+    outages = [OperationalError("UPDATE order_event", {}, Exception("database is locked"))] * 5
+
+    async def process_batch(limit=None):
+        if outages:
+            raise outages.pop()
+        return await events.OrderEventConsumer.process_batch(consumer, limit)
+
+    consumer.process_batch = process_batch
+    await run_until(consumer, lambda: consumer.applied == 2)
+    assert await statuses(order_ids) == ["Cancelled", "Cancelled"]
+    assert (consumer.failures, consumer.dead_lettered) == (5, 0)
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import delete
+
+pytestmark = pytest.mark.anyio
+
+ORDERS = 6
+
+
+@pytest.fixture
+async def history(client, make_customer, make_vendor, make_gym, make_slot, order):
+    vendor = await make_vendor()
+    gym_id = await make_gym(vendor)
+    customer_id, headers = await make_customer()
+    slot_ids = []
+    for days in range(1, ORDERS + 1):
+        slot_id = await make_slot(vendor, gym_id, day=date.today() + timedelta(days=days))
+        response = await client.post("/order/create_order/", json=order(customer_id, gym_id, slot_id), headers=headers)
+        response.raise_for_status()
+        slot_ids.append(slot_id)
+    return {"headers": headers, "slot_ids": slot_ids}
+
+
+async def statements_for(client, headers, **params) -> int:
+    """Statements the history route sent for one request."""
+    from src.metrics.instrumentation import RouteMetrics, registry
+
+    before = registry.routes.get(("GET", "/customer/orders"), RouteMetrics()).statements
+    response = await client.get("/customer/orders", params=params, headers=headers)
+    response.raise_for_status()
+    return registry.routes[("GET", "/customer/orders")].statements - before
+
+
+async def test_query_count_does_not_grow_with_the_page(client, history):
+    # Warm the principal cache so every request below authenticates the same way
+    await statements_for(client, history["headers"])
+    counts = {limit: await statements_for(client, history["headers"], limit=limit) for limit in (1, 3, ORDERS)}
+    assert counts[1] and len(set(counts.values())) == 1, counts
+
+
+async def test_cursor_pages_cover_every_order_once(client, history):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 4, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/customer/orders", params=params, headers=history["headers"])
+        response.raise_for_status()
+        pages.append(response.json()["items"])
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [4, ORDERS - 4]
+    assert sorted(item["slot_id"] for page in pages for item in page) == sorted(history["slot_ids"])
+
+
+async def test_orders_outlive_their_slot(client, history):
+    from src.models import Slot
+    from src.models.base import SessionLocal
+
+    async with SessionLocal() as db:
+        await db.execute(delete(Slot).where(Slot.slot_id == history["slot_ids"][0]))
+        await db.commit()
+    response = await client.get("/customer/orders", headers=history["headers"])
+    response.raise_for_status()
+    items = {item["slot_id"]: item for item in response.json()["items"]}
+    assert len(items) == ORDERS
+    assert items[history["slot_ids"][0]]["start_time"] is None
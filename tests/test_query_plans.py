@@ -0,0 +1,97 @@
+"""The hot queries keep using their indexes.
+
+Each test drives real requests while recording the SQL they send, then asks
+SQLite for the plan of every read and update among them. A plan step that
+scans a whole table means an index was dropped or a query stopped matching it.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+pytestmark = pytest.mark.anyio
+
+
+@contextmanager
+def recorded_statements():
+    from src.models.base import engine
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE"):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def full_scans(statements) -> list:
+    """(plan step, statement) for every step that reads a whole table."""
+    from src.models.base import engine
+
+    scans = []
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            # RETURNING is not valid after EXPLAIN QUERY PLAN on older SQLite builds and does not change the plan
+            plain = statement.split(" RETURNING ")[0]
+            parameters = parameters[: plain.count("?")]
+            plan = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {plain}", tuple(parameters))
+            for row in plan:
+                detail = row[-1]
+                if detail.startswith("SCAN ") and " USING " not in detail:
+                    scans.append((detail, " ".join(statement.split())))
+    return scans
+
+
+@pytest.fixture
+async def booked(client, make_customer, make_vendor, make_gym, make_slot, order):
+    vendor = await make_vendor()
+    gym_id = await make_gym(vendor)
+    slot_id = await make_slot(vendor, gym_id)
+    customer_id, headers = await make_customer()
+    response = await client.post("/order/create_order/", json=order(customer_id, gym_id, slot_id), headers=headers)
+    response.raise_for_status()
+    return {"vendor": vendor, "gym_id": gym_id, "slot_id": slot_id, "customer_id": customer_id,
+            "headers": headers, "order_id": response.json()["order_id"]}
+
+
+async def test_booking_uses_indexes(client, booked, make_customer, order):
+    customer_id, headers = await make_customer()
+    with recorded_statements() as statements:
+        body = order(customer_id, booked["gym_id"], booked["slot_id"])
+        (await client.post("/order/create_order/", json=body, headers=headers)).raise_for_status()
+        (await client.put(f"/order/update_order_status/{booked['order_id']}", params={"new_status": "Confirmed"},
+                          headers=booked["headers"])).raise_for_status()
+        (await client.put(f"/order/cancel_order/{booked['order_id']}", headers=booked["headers"])).raise_for_status()
+    assert statements
+    assert await full_scans(statements) == []
+
+
+async def test_reads_use_indexes(client, booked):
+    start = datetime.now()
+    with recorded_statements() as statements:
+        (await client.get("/customer/orders", headers=booked["headers"])).raise_for_status()
+        for params in ({}, {"gym_id": booked["gym_id"]}):
+            params = {"start_after": start.isoformat(), "end_before": (start + timedelta(days=7)).isoformat(), **params}
+            (await client.get("/slots/search", params=params, headers=booked["headers"])).raise_for_status()
+        (await client.get("/vendor/dashboard", headers=booked["vendor"])).raise_for_status()
+    assert statements
+    assert await full_scans(statements) == []
+
+
+async def test_logins_use_indexes(client, make_customer, make_vendor):
+    from .conftest import PASSWORD
+
+    await make_customer()
+    await make_vendor()
+    with recorded_statements() as statements:
+        (await client.post("/customer/login", data={"username": "customer-1@example.com",
+                                                    "password": PASSWORD})).raise_for_status()
+        (await client.post("/vendor/login", data={"username": "owner-1", "password": PASSWORD})).raise_for_status()
+    assert statements
+    assert await full_scans(statements) == []
@@ -0,0 +1,102 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select, update
+
+from .conftest import PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+LOGIN_BUDGET_PER_IP = 4
+LOGIN_BUDGET_PER_PRINCIPAL = 2
+
+
+@pytest.fixture(autouse=True)
+def trust_forwarded(monkeypatch):
+    monkeypatch.setattr("src.ratelimit.limiter.RATE_LIMIT_TRUST_FORWARDED", True)
+
+
+@pytest.fixture(params=["local", "database"])
+async def limiter(request, monkeypatch, make_customer):
+    """The app's limiter switched on, with small login budgets, on each backend.
+
+    customer-1 signs up first, as signing up logs in and would spend a token.
+    """
+    from src.models.base import SessionLocal
+    from src.ratelimit import limiter as module
+    from src.ratelimit.limiter import Bucket, DatabaseRateLimitBackend, LocalRateLimitBackend, RouteBudget
+
+    await make_customer()
+    limiter = module.limiter
+    backend = LocalRateLimitBackend() if request.param == "local" else DatabaseRateLimitBackend(SessionLocal)
+    monkeypatch.setattr(limiter, "enabled", True)
+    monkeypatch.setattr(limiter, "backend", backend)
+    # Refilling slowly enough that no token comes back during a test
+    monkeypatch.setitem(limiter.budgets, "customer_login", RouteBudget(
+        per_ip=Bucket(0.001, LOGIN_BUDGET_PER_IP), per_principal=Bucket(0.001, LOGIN_BUDGET_PER_PRINCIPAL)))
+    return limiter
+
+
+async def login(client, username: str, ip: str = "10.0.0.1"):
+    return await client.post("/customer/login", data={"username": username, "password": PASSWORD},
+                             headers={"X-Forwarded-For": ip})
+
+
+async def test_one_account_is_limited_from_any_address(client, limiter):
+    for i in range(LOGIN_BUDGET_PER_PRINCIPAL):
+        (await login(client, "customer-1@example.com", ip=f"10.0.0.{i}")).raise_for_status()
+    response = await login(client, "customer-1@example.com", ip="10.0.1.1")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    # Other accounts are unaffected
+    assert (await login(client, "someone-else@example.com", ip="10.0.1.1")).status_code != 429
+
+
+async def test_one_address_is_limited_across_accounts(client, limiter):
+    statuses = [(await login(client, f"guess-{i}@example.com")).status_code for i in range(LOGIN_BUDGET_PER_IP + 1)]
+    assert 429 not in statuses[:LOGIN_BUDGET_PER_IP]
+    assert statuses[-1] == 429
+    assert (await login(client, "guess-0@example.com", ip="10.0.0.2")).status_code != 429
+    assert limiter.stats()["customer_login"]["limited"] >= 1
+
+
+def test_requests_beyond_the_in_flight_cap_are_shed():
+    from src.ratelimit.limiter import RateLimiter, RouteBudget
+
+    limiter = RateLimiter({"route": RouteBudget(max_in_flight=1)})
+    with limiter.admit("route"):
+        with pytest.raises(HTTPException) as shed:
+            with limiter.admit("route"):
+                pass
+    assert shed.value.status_code == 503
+    assert shed.value.headers["Retry-After"] == "1"
+    # The slot is free again once the first request finishes
+    with limiter.admit("route"):
+        pass
+    assert limiter.stats()["route"] == {"allowed": 2, "limited": 0, "shed": 1, "in_flight": 0}
+
+
+async def test_database_backend_token_accounting(app):
+    from src.models import RateLimitBucket
+    from src.models.base import SessionLocal
+    from src.ratelimit.limiter import Bucket, DatabaseRateLimitBackend
+
+    backend = DatabaseRateLimitBackend(SessionLocal)
+    bucket = Bucket(rate=0.01, burst=3)
+
+    async def tokens() -> float:
+        async with SessionLocal() as db:
+            return await db.scalar(select(RateLimitBucket.tokens).where(RateLimitBucket.key == "key"))
+
+    assert [await backend.take("key", bucket) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert await tokens() == pytest.approx(0, abs=0.01)
+    wait = await backend.take("key", bucket)
+    assert 99 < wait <= 100
+    # A refused take spends nothing
+    assert await tokens() == pytest.approx(0, abs=0.01)
+
+    # Much later the bucket has refilled, but only up to its burst
+    async with SessionLocal() as db:
+        await db.execute(update(RateLimitBucket).values(updated_at=RateLimitBucket.updated_at - 1000))
+        await db.commit()
+    assert await backend.take("key", bucket) == 0.0
+    assert await tokens() == pytest.approx(bucket.burst - 1, abs=0.01)
@@ -0,0 +1,64 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def schedule(client, make_vendor, make_gym):
+    vendor = await make_vendor()
+    gym_id = await make_gym(vendor)
+    day = date.today() + timedelta(days=1)
+    spec = {"start_date": day.isoformat(), "end_date": (day + timedelta(days=2)).isoformat(),
+            "days": list(range(7)), "start_times": ["08:00", "12:00", "18:00"], "duration_minutes": 60,
+            "capacity": 5}
+    (await client.post(f"/gym/{gym_id}/slots/generate", json=spec, headers=vendor)).raise_for_status()
+    return datetime.combine(day, datetime.min.time())
+
+
+async def search(client, headers, start_after: datetime, **params) -> list:
+    pages = []
+    cursor = None
+    while True:
+        query = {"start_after": start_after.isoformat(), "end_before": (start_after + timedelta(days=7)).isoformat(),
+                 "limit": 2, **params, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/slots/search", params=query, headers=headers)
+        response.raise_for_status()
+        pages.append(response.json()["items"])
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+async def test_cursor_pages_cover_every_slot_once(client, make_customer, schedule):
+    _, headers = await make_customer()
+    pages = await search(client, headers, schedule)
+    starts = [item["start_time"] for page in pages for item in page]
+    assert len(pages) == 5
+    assert len(starts) == 9
+    assert starts == sorted(set(starts))
+
+
+async def test_cursor_never_goes_before_start_after(client, make_customer, schedule):
+    _, headers = await make_customer()
+    first_page = await client.get("/slots/search", headers=headers, params={
+        "start_after": schedule.isoformat(), "end_before": (schedule + timedelta(days=7)).isoformat(), "limit": 1})
+    cursor = first_page.json()["next_cursor"]
+    # A cursor from an earlier search, reused with a later start_after
+    later = schedule + timedelta(days=1)
+    response = await client.get("/slots/search", headers=headers, params={
+        "start_after": later.isoformat(), "end_before": (later + timedelta(days=7)).isoformat(), "cursor": cursor})
+    starts = [datetime.fromisoformat(item["start_time"]) for item in response.json()["items"]]
+    assert len(starts) == 6
+    assert min(starts) >= later
+
+
+async def test_bounds_with_and_without_an_offset(client, make_customer, schedule):
+    _, headers = await make_customer()
+    # The same instant as the schedule's start, given as UTC
+    start_after = schedule.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+    response = await client.get("/slots/search", headers=headers, params={
+        "start_after": start_after, "end_before": (schedule + timedelta(days=7)).isoformat(), "limit": 50})
+    response.raise_for_status()
+    assert len(response.json()["items"]) == 9
@@ -0,0 +1,143 @@
+import time
+
+import anyio
+import pytest
+from sqlalchemy import select
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def full_slot(client, make_customer, make_vendor, make_gym, make_slot, order):
+    """A one-seat slot, already booked; returns its body factory and the holder's order."""
+    from src.orders.events import consumer
+
+    # The app's consumer would race the batches each test runs
+    await consumer.stop()
+    vendor = await make_vendor()
+    gym_id = await make_gym(vendor)
+    slot_id = await make_slot(vendor, gym_id, capacity=1)
+    customer_id, headers = await make_customer()
+    response = await client.post("/order/create_order/", json=order(customer_id, gym_id, slot_id), headers=headers)
+    response.raise_for_status()
+    return {"slot_id": slot_id, "body": lambda customer_id: order(customer_id, gym_id, slot_id),
+            "holder": headers, "order_id": response.json()["order_id"]}
+
+
+async def join(client, make_customer, full_slot, customer=None):
+    """Queue a customer, a new one unless given; returns (entry, (customer_id, headers))."""
+    customer_id, headers = customer or await make_customer()
+    response = await client.post("/order/create_order/", params={"join_waitlist": True},
+                                 json=full_slot["body"](customer_id), headers=headers)
+    assert response.status_code == 202
+    return response.json(), (customer_id, headers)
+
+
+async def entry(client, headers, entry_id: int, **params):
+    response = await client.get(f"/order/waitlist/{entry_id}", params=params, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+async def release(client, full_slot):
+    """Cancel the holder's order and apply it."""
+    from src.orders.events import consumer
+
+    (await client.put(f"/order/cancel_order/{full_slot['order_id']}", headers=full_slot["holder"])).raise_for_status()
+    assert await consumer.process_batch() == 1
+
+
+async def seats_left(slot_id: str) -> int:
+    from src.models import Slot
+    from src.models.base import SessionLocal
+
+    async with SessionLocal() as db:
+        return await db.scalar(select(Slot.available_capacity).where(Slot.slot_id == slot_id))
+
+
+async def test_a_released_seat_goes_to_the_head_of_the_queue(client, make_customer, full_slot):
+    queue = [await join(client, make_customer, full_slot) for _ in range(3)]
+    assert [e["position"] for e, _ in queue] == [1, 2, 3]
+
+    await release(client, full_slot)
+    (first, (first_id, first_headers)), *rest = queue
+    promoted = await entry(client, first_headers, first["entry_id"])
+    assert promoted["status"] == "Promoted"
+    assert promoted["order_id"] is not None
+    assert [(await entry(client, headers, e["entry_id"]))["position"] for e, (_, headers) in rest] == [1, 2]
+    # The seat went straight to the promoted customer
+    assert await seats_left(full_slot["slot_id"]) == 0
+
+
+async def test_promotion_commits_with_the_release(client, make_customer, full_slot, monkeypatch):
+    from src.orders import events
+
+    async def failing_promote(db, slot_id, seats, start_time):
+        raise RuntimeError("cannot promote")
+
+    waiting, (_, headers) = await join(client, make_customer, full_slot)
+    monkeypatch.setattr(events, "promote", failing_promote)
+    (await client.put(f"/order/cancel_order/{full_slot['order_id']}", headers=full_slot["holder"])).raise_for_status()
+    with pytest.raises(RuntimeError):
+        await events.consumer.process_batch()
+
+    # Neither the release nor the seat it freed is kept without the promotion
+    assert await seats_left(full_slot["slot_id"]) == 0
+    assert (await entry(client, headers, waiting["entry_id"]))["status"] == "Waiting"
+    monkeypatch.undo()
+    assert await events.consumer.process_batch() == 1
+    assert (await entry(client, headers, waiting["entry_id"]))["status"] == "Promoted"
+
+
+async def test_joining_again_keeps_the_original_place(client, make_customer, full_slot):
+    first, customer = await join(client, make_customer, full_slot)
+    await join(client, make_customer, full_slot)
+    again, _ = await join(client, make_customer, full_slot, customer=customer)
+    assert again["entry_id"] == first["entry_id"]
+    assert again["position"] == 1
+
+
+async def test_leaving_the_queue(client, make_customer, full_slot):
+    first, (_, first_headers) = await join(client, make_customer, full_slot)
+    second, (_, second_headers) = await join(client, make_customer, full_slot)
+
+    # Only the customer who joined can remove the entry
+    assert (await client.delete(f"/order/waitlist/{first['entry_id']}", headers=second_headers)).status_code == 404
+    (await client.delete(f"/order/waitlist/{first['entry_id']}", headers=first_headers)).raise_for_status()
+    assert (await client.delete(f"/order/waitlist/{first['entry_id']}", headers=first_headers)).status_code == 404
+    assert (await entry(client, first_headers, first["entry_id"]))["status"] == "Left"
+    assert (await entry(client, second_headers, second["entry_id"]))["position"] == 1
+
+    # The seat skips the entry that left
+    await release(client, full_slot)
+    assert (await entry(client, second_headers, second["entry_id"]))["status"] == "Promoted"
+
+
+async def test_customers_only_see_their_own_entries(client, make_customer, full_slot):
+    waiting, _ = await join(client, make_customer, full_slot)
+    _, other_headers = await make_customer()
+    response = await client.get(f"/order/waitlist/{waiting['entry_id']}", headers=other_headers)
+    assert response.status_code == 404
+
+
+async def test_a_long_poll_wakes_on_promotion(client, make_customer, full_slot, monkeypatch):
+    from src.orders import waitlist
+
+    # Only the notifier, not the periodic recheck, can end the poll in time
+    monkeypatch.setattr(waitlist, "WAITLIST_POLL_INTERVAL", 30)
+    waiting, (_, headers) = await join(client, make_customer, full_slot)
+    polled = {}
+
+    async def poll():
+        started = time.perf_counter()
+        polled["entry"] = await entry(client, headers, waiting["entry_id"], wait=20)
+        polled["seconds"] = time.perf_counter() - started
+
+    with anyio.fail_after(10):
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(poll)
+            await anyio.sleep(0.1)
+            assert waitlist.notifier.stats()["waiting_polls"] == 1
+            await release(client, full_slot)
+    assert polled["entry"]["status"] == "Promoted"
+    assert polled["seconds"] < 5